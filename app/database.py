@@ -1,9 +1,108 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
+import importlib.util
 import os
+import threading
+import time
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+# auto: dùng engine async (asyncpg) với PostgreSQL, SQLite chạy session sync trong threadpool
+DB_ASYNC = os.getenv("DB_ASYNC", "auto").lower()
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += int(timed_out)
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+
+# Pool đo thời gian chờ lấy connection (bao gồm cả các lần hết hạn chờ)
+class _InstrumentedPoolMixin:
+    stats = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    stats = pool_stats
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    stats = async_pool_stats
+
+
+def engine_options(url, is_async: bool = False):
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+
+    options = {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if url.get_backend_name() == "postgresql" and DB_STATEMENT_TIMEOUT_MS:
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+def async_database_url(url):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if DB_ASYNC in ("0", "false", "no") or driver is None:
+        return None
+    if DB_ASYNC == "auto" and backend != "postgresql":
+        return None
+    if importlib.util.find_spec(driver) is None:
+        if DB_ASYNC == "auto":
+            return None
+        raise RuntimeError(f"DB_ASYNC={DB_ASYNC} nhưng chưa cài driver {driver}")
+    return url.set(drivername=f"{backend}+{driver}")
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -11,8 +110,66 @@ def get_db():
     finally:
         db.close()
 
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+ASYNC_DATABASE_URL = async_database_url(DATABASE_URL)
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_DATABASE_URL is not None:
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+# Session sync chạy trong threadpool, cùng giao diện run_sync với AsyncSession
+class ThreadedSession:
+    def __init__(self, session):
+        self.session = session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+    async def close(self):
+        await run_in_threadpool(self.session.close)
+
+
+# Dependency cho các route async: gọi `await db.run_sync(loader, ...)` với loader nhận Session sync
+async def get_async_db():
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = ThreadedSession(SessionLocal())
+        try:
+            yield db
+        finally:
+            await db.close()
+
 Base = declarative_base()
+
+
+def _pool_status(pool, stats):
+    status = {
+        "pool_class": type(pool).__name__,
+        "checkouts": stats.checkouts,
+        "timeouts": stats.timeouts,
+        "wait_seconds_total": round(stats.wait_seconds_total, 6),
+        "wait_seconds_max": round(stats.wait_seconds_max, 6),
+    }
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": DB_MAX_OVERFLOW,
+        })
+    return status
+
+
+def pool_status():
+    status = _pool_status(engine.pool, pool_stats)
+    if async_engine is not None:
+        status["async"] = _pool_status(async_engine.pool, async_pool_stats)
+    return status
@@ -1,79 +1,134 @@
 from fastapi import FastAPI
-from app.database import engine, Base
+from fastapi.responses import ORJSONResponse
 from app.models import models
-from app.database import engine, SessionLocal
+from app.database import engine, SessionLocal, async_engine
 from contextlib import asynccontextmanager
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timedelta
-from app.routers import auth, posts, comments, users, votes
-from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import case, exists, func, update
+import logging
+import os
+import time
+from app.routers import auth, posts, comments, users, votes, metrics, events, admin
+from app.utils.cache import invalidate_all, invalidate_feed
+from app.utils.events import broker
+from app.utils.metrics import instrument_engine
+from app.utils.ranking import refresh_hot_scores
+from app.utils.rate_limit import rate_limit_backend
+from app.utils.security import password_hasher
+from app.middleware import install_middleware
 
 
-def decay_reputation_job():
-    print("--- BẮT ĐẦU QUÉT ĐIỂM UY TÍN ---")
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Đếm số câu SQL / thời gian DB cho từng request (xem /metrics và header Server-Timing)
+instrument_engine(engine)
+instrument_engine(async_engine)
+
+REPUTATION_DECAY_POINTS = 5
+REPUTATION_DECAY_INACTIVE_DAYS = 7
+REPUTATION_DECAY_CHUNK_SIZE = int(os.getenv("REPUTATION_DECAY_CHUNK_SIZE", "5000"))
+HOT_REFRESH_MINUTES = float(os.getenv("HOT_REFRESH_MINUTES", "15"))
+
+
+def decay_reputation_job(chunk_size: int = REPUTATION_DECAY_CHUNK_SIZE):
+    logger.info("Bắt đầu quét điểm uy tín")
+    started = time.perf_counter()
+    cutoff = datetime.utcnow() - timedelta(days=REPUTATION_DECAY_INACTIVE_DAYS)
+    User, Post = models.User, models.Post
+
+    # Chỉ trừ điểm user đã từng đăng bài nhưng không có bài nào trong 7 ngày qua, điểm không xuống dưới 0
+    has_posts = exists().where(Post.author_id == User.id)
+    has_recent_post = exists().where(Post.author_id == User.id, Post.created_at > cutoff)
+    decayed = case(
+        (User.reputation < REPUTATION_DECAY_POINTS, 0),
+        else_=User.reputation - REPUTATION_DECAY_POINTS
+    )
+
+    touched = 0
     db = SessionLocal()
     try:
-        users = db.query(models.User).all()
-        for user in users:
-            last_post = db.query(models.Post)\
-                .filter(models.Post.author_id == user.id)\
-                .order_by(models.Post.created_at.desc())\
-                .first()
-            
-            should_penalize = False
-            
-            if not last_post:
-                pass 
-            else:
-                days_diff = (datetime.utcnow() - last_post.created_at).days
-                if days_diff >= 7:
-                    should_penalize = True
-            
-            if should_penalize and user.reputation > 0:
-                if user.reputation < 5:
-                    user.reputation = 0
-                else:
-                    user.reputation -= 5
-                print(f"User {user.username} bị trừ điểm vì lười đăng bài.")
-        
+        max_id = db.query(func.max(User.id)).scalar() or 0
+        for low in range(0, max_id, chunk_size):
+            result = db.execute(
+                update(User)
+                .where(
+                    User.id > low,
+                    User.id <= low + chunk_size,
+                    User.reputation > 0,
+                    has_posts,
+                    ~has_recent_post
+                )
+                .values(reputation=decayed)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            touched += result.rowcount
+    except Exception as e:
+        db.rollback()
+        logger.exception("Lỗi khi trừ điểm uy tín: %s", e)
+    finally:
+        db.close()
+
+    if touched:
+        invalidate_all()
+
+    elapsed = time.perf_counter() - started
+    logger.info("Kết thúc: trừ điểm %d user trong %.2f giây", touched, elapsed)
+    return {"users_penalized": touched, "elapsed_seconds": elapsed}
+
+
+# Vote / bình luận đã cập nhật điểm hot ngay khi ghi; job này bắt kịp thay đổi uy tín và vai trò tác giả
+def refresh_hot_scores_job():
+    db = SessionLocal()
+    try:
+        updated = refresh_hot_scores(db)
         db.commit()
     except Exception as e:
-        print(f"Lỗi khi chạy: {e}")
+        db.rollback()
+        logger.exception("Lỗi khi tính lại điểm hot: %s", e)
+        return 0
     finally:
         db.close()
 
+    if updated:
+        invalidate_feed()
+    return updated
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     scheduler = BackgroundScheduler()
     
     from apscheduler.triggers.cron import CronTrigger
     scheduler.add_job(decay_reputation_job, CronTrigger(hour=0, minute=0))
+    # Dọn các lượt rate limit đã hết hạn
+    scheduler.add_job(rate_limit_backend.purge, "interval", minutes=10)
+    scheduler.add_job(refresh_hot_scores_job, "interval", minutes=HOT_REFRESH_MINUTES)
     
     scheduler.start()
+    broker.start()
     yield
+    broker.stop()
     scheduler.shutdown()
+    password_hasher.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
 
-app = FastAPI(lifespan=lifespan)
-
-origins = [
-    "http://localhost:5173",
-    "http://127.0.0.1:5173",
-    "https://fastapi-forum-project-1.onrender.com",
-]
+# Mặc định render JSON bằng orjson; các route đọc khai báo response_model để pydantic-core chuyển
+# dữ liệu sang kiểu JSON thay cho jsonable_encoder
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+install_middleware(app)
 
 app.include_router(auth.router)
 app.include_router(posts.router)
 app.include_router(comments.router)
 app.include_router(users.router)
 app.include_router(votes.router)
-
-
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+app.include_router(metrics.router)
+app.include_router(events.router)
+app.include_router(admin.router)
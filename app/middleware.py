@@ -0,0 +1,247 @@
+import os
+import zlib
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.utils.metrics import RequestStats, observe_request, request_stats
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CORS_ORIGINS = os.getenv(
+    "CORS_ORIGINS",
+    "http://localhost:5173,http://127.0.0.1:5173,https://fastapi-forum-project-1.onrender.com"
+).split(",")
+
+# Các kiểu nén bật theo thứ tự ưu tiên; để trống để tắt nén. br chỉ dùng được khi đã cài brotli
+COMPRESSION = [name.strip() for name in os.getenv("COMPRESSION", "br,gzip").split(",") if name.strip()]
+# Response nhỏ hơn ngưỡng này (byte) được gửi nguyên: nén tốn CPU hơn phần băng thông tiết kiệm được
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Gắn header Server-Timing (số câu SQL, thời gian DB, thời gian tới khi bắt đầu trả response)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "image/svg+xml",
+    "text/",
+)
+
+
+# Đánh dấu route không nén (response luôn nhỏ), đặt ngay dưới decorator của router
+def no_compression(endpoint):
+    endpoint.skip_compression = True
+    return endpoint
+
+
+class GzipCompressor:
+    name = "gzip"
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    name = "br"
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+COMPRESSORS = {"gzip": GzipCompressor}
+if brotli is not None:
+    COMPRESSORS["br"] = BrotliCompressor
+
+
+def choose_encoding(accept_encoding: str, encodings):
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name] = quality
+    for name in encodings:
+        if accepted.get(name, accepted.get("*", 0)) > 0:
+            return name
+    return None
+
+
+# Nén gzip / brotli dạng ASGI thuần (không bọc response như BaseHTTPMiddleware).
+# Response có đủ body trong một lần gửi thì nén cả khối nếu vượt ngưỡng; response streaming (NDJSON, SSE)
+# được nén theo từng chunk và flush ngay nên client vẫn nhận dữ liệu không bị giữ lại
+class CompressionMiddleware:
+    def __init__(self, app, encodings=None, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.encodings = [name for name in (COMPRESSION if encodings is None else encodings) if name in COMPRESSORS]
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if scope["method"] == "HEAD":
+            encoding = None
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if message["status"] == 304:
+                    # 304 phải mang cùng Vary với response 200 mà nó thay thế
+                    headers.add_vary_header("Accept-Encoding")
+                if not self.should_compress(scope, message["status"], headers):
+                    passthrough = True
+                    await send(message)
+                    return
+                # Response phụ thuộc Accept-Encoding: ghép vào Vary sẵn có (Authorization, Origin của CORS)
+                headers.add_vary_header("Accept-Encoding")
+                if encoding is None:
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                compressor = COMPRESSORS[encoding]()
+                headers["Content-Encoding"] = encoding
+                # Body đã đổi so với bản không nén nên ETag mạnh phải chuyển thành ETag yếu
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = compressor.compress(body) + compressor.finish()
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start_message)
+
+            if more_body:
+                body = compressor.compress(body) + compressor.flush()
+            else:
+                body = compressor.compress(body) + compressor.finish()
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def should_compress(self, scope, status: int, headers: MutableHeaders):
+        if status < 200 or status in (204, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        if getattr(scope.get("endpoint"), "skip_compression", False):
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def server_timing(stats: RequestStats):
+    return (
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", '
+        f"app;dur={stats.elapsed() * 1000:.1f}"
+    )
+
+
+# Đo mỗi request HTTP: thời gian, số câu SQL, thời gian DB, số dòng (ghi bởi hook trong app.utils.metrics).
+# Nhãn route là mẫu đường dẫn (/posts/{post_id}) để số series không tăng theo id
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        status = 500
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING:
+                    MutableHeaders(raw=message["headers"]).append("Server-Timing", server_timing(stats))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            request_stats.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            observe_request(scope["method"], route, status, stats)
+
+
+# Thứ tự: middleware thêm sau bọc bên ngoài. CORS ở ngoài cùng để xử lý preflight trước
+# và thêm "Origin" vào Vary sau khi lớp nén đã thêm "Accept-Encoding"; lớp đo bọc lớp nén
+# nên thời gian nén cũng được tính
+def install_middleware(app: FastAPI):
+    app.add_middleware(CompressionMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=CORS_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
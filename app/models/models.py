@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, DateTime, Float, Index
 from sqlalchemy.orm import relationship, backref
 from datetime import datetime
 
@@ -32,11 +32,22 @@ class Post(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     is_pinned = Column(Boolean, default=False)
     comment_count = Column(Integer, default=0)
+    vote_count = Column(Integer, default=0)
+    # Tính bởi app.utils.ranking, dùng cho ?sort=hot
+    hot_score = Column(Float, nullable=False, server_default="0")
 
     author = relationship("User", back_populates="posts")
     comments = relationship("Comment", back_populates="post")
     votes = relationship("Vote", back_populates="post")
 
+    # Mỗi chế độ sắp xếp của feed (hot / new / top) là một lần quét ngược chỉ mục
+    __table_args__ = (
+        Index("ix_posts_hot_order", is_pinned, hot_score, id),
+        Index("ix_posts_new_order", is_pinned, created_at, id),
+        Index("ix_posts_top_order", is_pinned, vote_count, id),
+        Index("ix_posts_author_created", author_id, created_at),
+    )
+
 
 class Comment(Base):
     __tablename__ = "comments"
@@ -49,6 +60,7 @@ class Comment(Base):
     parent_id = Column(Integer, ForeignKey("comments.id"), nullable=True)
     is_pinned = Column(Boolean, default=False) 
     is_deleted = Column(Boolean, default=False)
+    vote_count = Column(Integer, default=0)
 
     
 
@@ -57,6 +69,14 @@ class Comment(Base):
     post = relationship("Post", back_populates="comments")
     votes = relationship("Vote", back_populates="comment")
 
+    __table_args__ = (
+        Index("ix_comments_post_created", post_id, created_at),
+        # Phân trang bình luận cùng cấp theo thứ tự hiển thị (ghim, vote, thời gian)
+        Index("ix_comments_thread_order", post_id, parent_id, is_pinned, vote_count, created_at, id),
+        Index("ix_comments_parent_id", parent_id),
+        Index("ix_comments_author_id", author_id),
+    )
+
 
 class Vote(Base):
     __tablename__ = "votes"
@@ -70,3 +90,41 @@ class Vote(Base):
     user = relationship("User", back_populates="votes")
     post = relationship("Post", back_populates="votes")
     comment = relationship("Comment", back_populates="votes")
+
+    # Mỗi user chỉ có một vote cho mỗi bài viết / bình luận; là đích ON CONFLICT khi toggle vote
+    __table_args__ = (
+        Index(
+            "uq_votes_user_post",
+            user_id,
+            post_id,
+            unique=True,
+            postgresql_where=post_id.isnot(None),
+            sqlite_where=post_id.isnot(None),
+        ),
+        Index(
+            "uq_votes_user_comment",
+            user_id,
+            comment_id,
+            unique=True,
+            postgresql_where=comment_id.isnot(None),
+            sqlite_where=comment_id.isnot(None),
+        ),
+        Index("ix_votes_post_user", post_id, user_id),
+        Index("ix_votes_comment_user", comment_id, user_id),
+        Index("ix_votes_user_id", user_id),
+    )
+
+
+# Nhật ký lượt truy cập cho rate limiter dùng chung giữa các worker (RATE_LIMIT_BACKEND=sql)
+class RateLimitHit(Base):
+    __tablename__ = "rate_limit_hits"
+
+    id = Column(Integer, primary_key=True)
+    key = Column(String(200), nullable=False)
+    hit_at = Column(Float, nullable=False)
+    expires_at = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("ix_rate_limit_hits_key_hit_at", key, hit_at),
+        Index("ix_rate_limit_hits_expires_at", expires_at),
+    )
@@ -0,0 +1,208 @@
+import os
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models.models import Comment, Post, User, Vote
+from app.utils.auth import get_current_user
+from app.utils.cache import invalidate_posts
+from app.utils.counters import live_comment_count
+from app.utils.events import notify_posts
+from app.utils.principal_cache import Principal, invalidate_principals
+from app.utils.ranking import refresh_hot_scores
+
+# Số id tối đa cho một lần thao tác hàng loạt; lọc theo điều kiện thì xóa tối đa chừng ấy bài mỗi lần
+ADMIN_BATCH_MAX = int(os.getenv("ADMIN_BATCH_MAX", "1000"))
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+class UserIds(BaseModel):
+    user_ids: List[int] = Field(min_length=1)
+
+
+class PostDeleteFilter(BaseModel):
+    post_ids: Optional[List[int]] = None
+    author_ids: Optional[List[int]] = None
+    title_contains: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+
+def require_admin(current_user: Principal = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Bạn không phải admin")
+    return current_user
+
+
+def unique_ids(ids: List[int]):
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > ADMIN_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Tối đa {ADMIN_BATCH_MAX} id cho mỗi lần thao tác")
+    return ids
+
+
+def existing_user_ids(db: Session, ids: List[int]):
+    return set(db.execute(select(User.id).where(User.id.in_(ids))).scalars())
+
+
+# Ban / unban bằng một câu UPDATE; chỉ ghi những user đang ở trạng thái khác, không tự ban chính mình
+def set_banned(db: Session, ids: List[int], current_user: Principal, banned: bool):
+    ids = unique_ids(ids)
+    found = existing_user_ids(db, ids)
+    changed = set(
+        db.execute(
+            update(User)
+            .where(User.id.in_(ids), User.id != current_user.id, User.is_banned.is_distinct_from(banned))
+            .values(is_banned=banned)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        ).scalars()
+    )
+    db.commit()
+    invalidate_principals(changed)
+
+    done = "banned" if banned else "unbanned"
+    results = []
+    for user_id in ids:
+        if user_id not in found:
+            status = "not_found"
+        elif user_id == current_user.id:
+            status = "self"
+        elif user_id in changed:
+            status = done
+        else:
+            status = "unchanged"
+        results.append({"user_id": user_id, "status": status})
+    return {"changed": len(changed), "results": results}
+
+
+@router.post("/users/ban")
+def ban_users(
+    body: UserIds,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_admin)
+):
+    return set_banned(db, body.user_ids, current_user, True)
+
+
+@router.post("/users/unban")
+def unban_users(
+    body: UserIds,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_admin)
+):
+    return set_banned(db, body.user_ids, current_user, False)
+
+
+# Xóa mềm toàn bộ bình luận của các user; comment_count và hot_score của các bài bị ảnh hưởng
+# được tính lại trong cùng transaction
+@router.post("/comments/delete-by-user")
+def delete_comments_by_users(
+    body: UserIds,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_admin)
+):
+    ids = unique_ids(body.user_ids)
+    found = existing_user_ids(db, ids)
+    rows = db.execute(
+        update(Comment)
+        .where(Comment.author_id.in_(ids), Comment.is_deleted.is_not(True))
+        .values(is_deleted=True)
+        .returning(Comment.author_id, Comment.post_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    deleted = {}
+    post_ids = set()
+    for row in rows:
+        deleted[row.author_id] = deleted.get(row.author_id, 0) + 1
+        if row.post_id is not None:
+            post_ids.add(row.post_id)
+    post_ids = sorted(post_ids)
+    if post_ids:
+        db.execute(
+            update(Post)
+            .where(Post.id.in_(post_ids))
+            .values(comment_count=live_comment_count())
+            .execution_options(synchronize_session=False)
+        )
+        refresh_hot_scores(db, post_ids)
+    db.commit()
+
+    if post_ids:
+        invalidate_posts(post_ids)
+        notify_posts("comments_deleted", post_ids)
+
+    results = [
+        {
+            "user_id": user_id,
+            "status": "deleted" if user_id in found else "not_found",
+            "deleted": deleted.get(user_id, 0),
+        }
+        for user_id in ids
+    ]
+    return {"deleted": len(rows), "posts_affected": len(post_ids), "results": results}
+
+
+# Xóa bài theo danh sách id và/hoặc điều kiện lọc (các điều kiện kết hợp bằng AND).
+# Giống xóa từng bài: bình luận và vote được giữ lại nhưng bỏ liên kết tới bài đã xóa.
+# Mỗi lần xóa tối đa ADMIN_BATCH_MAX bài, has_more cho biết còn bài khớp điều kiện
+@router.post("/posts/delete")
+def delete_posts(
+    criteria: PostDeleteFilter,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_admin)
+):
+    conditions = []
+    requested = None
+    if criteria.post_ids is not None:
+        requested = unique_ids(criteria.post_ids)
+        conditions.append(Post.id.in_(requested))
+    if criteria.author_ids is not None:
+        conditions.append(Post.author_id.in_(unique_ids(criteria.author_ids)))
+    if criteria.title_contains:
+        pattern = criteria.title_contains.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append(Post.title.ilike(f"%{pattern}%", escape="\\"))
+    if criteria.created_after is not None:
+        conditions.append(Post.created_at >= criteria.created_after)
+    if criteria.created_before is not None:
+        conditions.append(Post.created_at < criteria.created_before)
+    if not conditions:
+        raise HTTPException(status_code=400, detail="Cần ít nhất một điều kiện để xóa bài viết")
+
+    matched = db.execute(
+        select(Post.id).where(*conditions).order_by(Post.id).limit(ADMIN_BATCH_MAX + 1)
+    ).scalars().all()
+    has_more = len(matched) > ADMIN_BATCH_MAX
+    post_ids = matched[:ADMIN_BATCH_MAX]
+
+    if post_ids:
+        db.execute(
+            update(Comment)
+            .where(Comment.post_id.in_(post_ids))
+            .values(post_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            update(Vote)
+            .where(Vote.post_id.in_(post_ids))
+            .values(post_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(delete(Post).where(Post.id.in_(post_ids)).execution_options(synchronize_session=False))
+    db.commit()
+
+    if post_ids:
+        invalidate_posts(post_ids)
+        notify_posts("posts_deleted", post_ids)
+
+    deleted = set(post_ids)
+    results = [{"post_id": post_id, "status": "deleted"} for post_id in post_ids]
+    if requested is not None:
+        results += [{"post_id": post_id, "status": "not_matched"} for post_id in requested if post_id not in deleted]
+    return {"deleted": len(post_ids), "has_more": has_more, "results": results}
@@ -1,74 +1,83 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from app.database import get_async_db
 from app.models.models import User
-from app.schemas import UserCreate 
-from app.utils.rate_limit import check_rate_limit, add_failed_attempt, reset_attempts
-from app.utils.security import hash_password, verify_password, create_access_token
+from app.schemas import UserCreate
+from app.utils.rate_limit import call_rate_limit, check_rate_limit, add_failed_attempt, reset_attempts
+from app.utils.security import hash_password_async, verify_password_async, create_access_token
+from app.middleware import no_compression
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # --- ĐĂNG KÝ ---
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-def register(user_input: UserCreate, db: Session = Depends(get_db)): 
+@no_compression
+async def register(user_input: UserCreate, db = Depends(get_async_db)):
+
+    await db.run_sync(check_user_available, user_input)
+
+    hashed_password = await hash_password_async(user_input.password)
+    new_user_id = await db.run_sync(create_user, user_input, hashed_password)
+
+    return {
+        "message": "Đăng ký thành công",
+        "user_id": new_user_id,
+    }
+
 
-    user_exists = db.query(User).filter(User.username == user_input.username).first()
+def check_user_available(db: Session, user_input: UserCreate):
+    user_exists = db.query(User.id).filter(User.username == user_input.username).first()
     if user_exists:
         raise HTTPException(
-            status_code=400, 
+            status_code=400,
             detail="Tên đăng nhập đã tồn tại"
         )
 
-    email_exists = db.query(User).filter(User.email == user_input.email).first()
+    email_exists = db.query(User.id).filter(User.email == user_input.email).first()
     if email_exists:
         raise HTTPException(
-            status_code=400, 
+            status_code=400,
             detail="Email đã được sử dụng"
         )
 
+    # Trả connection về pool ngay trong thread này, trước khi chờ băm mật khẩu
+    db.close()
+
+
+def create_user(db: Session, user_input: UserCreate, hashed_password: str):
     final_display_name = user_input.display_name if user_input.display_name else user_input.username
     new_user = User(
         username=user_input.username,
         email=user_input.email,
         display_name=final_display_name,
-        password=hash_password(user_input.password),
+        password=hashed_password,
         role="member"
     )
 
     db.add(new_user)
     db.commit()
-    db.refresh(new_user)
-
-    return {
-        "message": "Đăng ký thành công",
-        "user_id": new_user.id,
-    }
+    return new_user.id
 
 
 
 # --- ĐĂNG NHẬP ---
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+@no_compression
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(get_async_db)):
 
-    identifier = form_data.username 
+    identifier = form_data.username
 
-    check_rate_limit(identifier)
+    await call_rate_limit(check_rate_limit, identifier)
 
-    user = db.query(User).filter(
-        (User.username == identifier) | (User.email == identifier)
-    ).first()
+    user = await db.run_sync(find_login_user, identifier)
+
+    password_ok, new_hash = False, None
+    if user:
+        password_ok, new_hash = await verify_password_async(form_data.password, user.password)
 
-    if not user or not verify_password(form_data.password, user.password):
-        add_failed_attempt(identifier)
+    if not password_ok:
+        await call_rate_limit(add_failed_attempt, identifier)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Sai thông tin đăng nhập"
@@ -80,10 +89,29 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
             detail="Tài khoản của bạn đã bị khóa do vi phạm quy định."
         )
 
-    reset_attempts(identifier)
+    # Hash cũ có cost thấp hơn cấu hình hiện tại: lưu hash mới băm lại từ mật khẩu vừa nhập
+    if new_hash:
+        await db.run_sync(update_password_hash, user.id, new_hash)
+
+    await call_rate_limit(reset_attempts, identifier)
 
     access_token = create_access_token(
         data={"sub": user.username, "id": user.id}
     )
 
     return {"access_token": access_token, "token_type": "bearer"}
+
+
+def find_login_user(db: Session, identifier: str):
+    user = db.query(User.id, User.username, User.password, User.is_banned).filter(
+        (User.username == identifier) | (User.email == identifier)
+    ).first()
+    db.close()
+    return user
+
+
+def update_password_hash(db: Session, user_id: int, new_hash: str):
+    db.query(User).filter(User.id == user_id).update(
+        {User.password: new_hash}, synchronize_session=False
+    )
+    db.commit()
@@ -1,16 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, false, func, select, tuple_, update
 from sqlalchemy.orm import Session
 from pydantic import BaseModel 
-from typing import Optional
-from app.database import get_db
+from typing import List, Optional, Union
+import orjson
+import os
+from app.database import get_db, get_async_db, SessionLocal
 from app.models.models import Comment, Post, User, Vote 
-from app.routers.posts import get_current_user
-from sqlalchemy import exists 
-from app.utils.security import SECRET_KEY, ALGORITHM 
-from jose import jwt
+from app.utils.votes import adjust_reputation, commented_post_ids, toggle_comment_vote
+from app.utils.auth import get_current_user, get_current_user_optional
+from app.utils.principal_cache import Principal
+from app.utils.rate_limit import comment_rate_limit, vote_rate_limit
+from app.utils.cache import comments_namespace, invalidate_comments, invalidate_posts, not_modified, payload_etag, response_cache
+from app.utils.counters import bump_post_comments
+from app.utils.ranking import refresh_hot_scores
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.events import notify_comment
+from app.schemas import CommentNode, CommentPage
 
 router = APIRouter(prefix="/comments", tags=["Comments"])
 
+COMMENT_PAGE_MAX = 100
+COMMENT_STREAM_BATCH = int(os.getenv("COMMENT_STREAM_BATCH", "500"))
+
+# Thứ tự hiển thị các bình luận cùng cấp, tất cả giảm dần; Comment.id là khóa phụ của cursor
+THREAD_ORDER = (Comment.is_pinned, Comment.vote_count, Comment.created_at, Comment.id)
+
 class CommentCreate(BaseModel):
     content: str
     parent_id: Optional[int] = None
@@ -22,7 +38,7 @@ class CommentUpdate(BaseModel):
 def toggle_pin_comment(
     comment_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     comment = db.query(Comment).filter(Comment.id == comment_id).first()
     if not comment:
@@ -34,6 +50,8 @@ def toggle_pin_comment(
 
     comment.is_pinned = not comment.is_pinned
     db.commit()
+    invalidate_comments(comment.post_id)
+    notify_comment("comment_pinned", comment.post_id, comment_id=comment.id, is_pinned=comment.is_pinned)
     
     action = "đã ghim" if comment.is_pinned else "đã bỏ ghim"
     return {"message": f"Bình luận {action}", "is_pinned": comment.is_pinned}
@@ -43,7 +61,7 @@ def update_comment(
     comment_id: int,
     data: CommentUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     comment = db.query(Comment).filter(Comment.id == comment_id).first()
     if not comment:
@@ -54,6 +72,9 @@ def update_comment(
 
     comment.content = data.content
     db.commit()
+    invalidate_comments(comment.post_id)
+    # Không gửi nội dung (không giới hạn độ dài) qua sự kiện: client tải lại bình luận khi cần
+    notify_comment("comment_updated", comment.post_id, comment_id=comment.id)
 
     return {"message": "Cập nhật bình luận thành công"}
 
@@ -61,7 +82,7 @@ def update_comment(
 def delete_comment(
     comment_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     comment = db.query(Comment).filter(Comment.id == comment_id).first()
     if not comment:
@@ -76,108 +97,272 @@ def delete_comment(
     if not (is_comment_owner or is_post_owner or is_admin):
         raise HTTPException(status_code=403, detail="Bạn không có quyền xóa bình luận này")
 
-    if post and post.comment_count > 0:
-        post.comment_count -= 1
-
-    comment.is_deleted = True
+    # Chỉ request thật sự đánh dấu xóa mới trừ comment_count: xóa lại (kể cả song song) không trừ thêm
+    deleted = db.execute(
+        update(Comment)
+        .where(Comment.id == comment_id, Comment.is_deleted.is_not(True))
+        .values(is_deleted=True)
+        .returning(Comment.id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if not deleted:
+        return {"message": "Đã xóa bình luận"}
+
+    post_id = comment.post_id
+    comment_count = 0
+    if post:
+        comment_count = bump_post_comments(db, post_id, -1) or 0
+        refresh_hot_scores(db, [post_id])
 
     db.commit()
+    invalidate_comments(post_id, feed=True)
+    notify_comment("comment_deleted", post_id, feed=True, comment_id=comment_id, comment_count=comment_count)
 
     return {"message": "Đã xóa bình luận"}
 
 
-@router.get("/{post_id}")
-def get_comments(
+# Không truyền parent_id / cursor: trả về toàn bộ cây như cũ.
+# Có parent_id hoặc cursor (cursor="" là trang đầu): trả về một trang bình luận cùng cấp kèm reply_count,
+# client tải nhánh trả lời bằng parent_id khi cần
+@router.get("/{post_id}", response_model=Union[CommentPage, List[CommentNode]])
+async def get_comments(
     post_id: int, 
-    db: Session = Depends(get_db),
-    token: Optional[str] = Header(None, alias="Authorization")
+    request: Request,
+    response: Response,
+    parent_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    db = Depends(get_async_db),
+    current_user: Optional[Principal] = Depends(get_current_user_optional)
 ):
-    post = db.query(Post).filter(Post.id == post_id).first()
-    if not post:
+    paged = parent_id is not None or cursor is not None
+    limit = min(max(limit, 1), COMMENT_PAGE_MAX)
+
+    def load(session: Session, current_user_id: Optional[int] = None):
+        if paged:
+            return load_comment_page(session, post_id, parent_id, cursor, limit, current_user_id)
+        return load_comments(session, post_id, current_user_id)
+
+    if current_user is None:
+        comments, etag = await response_cache.get_or_load(
+            comments_namespace(post_id),
+            ("comments", parent_id, cursor, limit) if paged else ("comments",),
+            lambda: db.run_sync(load)
+        )
+    else:
+        comments = await db.run_sync(load, current_user.id)
+        etag = payload_etag(comments)
+
+    unchanged = not_modified(request, response, etag, current_user.id if current_user else None)
+    if unchanged:
+        return unchanged
+    return comments
+
+
+# NDJSON: mỗi dòng một bình luận theo thứ tự thời gian (cha luôn đứng trước con),
+# đọc từ DB theo từng lô nên bộ nhớ không phụ thuộc vào độ lớn của thread
+@router.get("/{post_id}/stream")
+async def stream_comments(
+    post_id: int,
+    db = Depends(get_async_db),
+    current_user: Optional[Principal] = Depends(get_current_user_optional)
+):
+    await db.run_sync(ensure_post_exists, post_id)
+    # Trả connection về pool: generator dùng session riêng trong suốt thời gian stream
+    await db.close()
+
+    current_user_id = current_user.id if current_user else None
+    return StreamingResponse(
+        iter_comment_lines(post_id, current_user_id),
+        media_type="application/x-ndjson"
+    )
+
+
+def ensure_post_exists(db: Session, post_id: int):
+    post_exists = db.query(Post.id).filter(Post.id == post_id).first()
+    if not post_exists:
         raise HTTPException(status_code=404, detail="Bài viết không tồn tại")
-    
-    current_user_id = None
-    if token:
-        try:
-            scheme, _, param = token.partition(" ")
-            actual_token = param if scheme.lower() == 'bearer' else token
-            payload = jwt.decode(actual_token, SECRET_KEY, algorithms=[ALGORITHM])
-            username = payload.get("sub")
-            user = db.query(User).filter(User.username == username).first()
-            if user:
-                current_user_id = user.id
-        except:
-            pass
-
-    comments = db.query(Comment).filter(Comment.post_id == post_id).all()
-    
-    result = []
-    for c in comments:
-        author = db.query(User).filter(User.id == c.author_id).first()
-        vote_count = db.query(Vote).filter(Vote.comment_id == c.id).count()
-        
-        has_voted = False
-        if current_user_id:
-            has_voted = db.query(exists().where(
-                Vote.comment_id == c.id,
-                Vote.user_id == current_user_id
-            )).scalar()
-
-        result.append({
-            "id": c.id,
-            "content": c.content,
-            "author_display_name": author.display_name if author else "Unknown",
-            "created_at": c.created_at,
-            "author_id": c.author_id,
-            "parent_id": c.parent_id,
-            "vote_count": vote_count,  
-            "has_voted": has_voted,
-            "is_pinned": c.is_pinned,
-            "badge": get_badge(post.author.reputation) if post.author else None,
-            "is_deleted": c.is_deleted
-        })
-    result.sort(key=lambda x: (x['is_pinned'], x['vote_count'], x['created_at']), reverse=True)
-    
-    return result
 
-@router.post("/{comment_id}/vote")
+
+def load_comments(db: Session, post_id: int, current_user_id: Optional[int] = None):
+    ensure_post_exists(db, post_id)
+    return load_comment_tree(db, post_id, current_user_id)
+
+
+# Các cột một bình luận cần khi hiển thị (kèm tác giả và has_voted), không nạp entity Comment / User
+def comment_query(current_user_id: Optional[int] = None):
+    if current_user_id:
+        has_voted = Vote.id.is_not(None)
+    else:
+        has_voted = false()
+    query = (
+        select(
+            Comment.id,
+            Comment.content,
+            Comment.author_id,
+            Comment.parent_id,
+            Comment.created_at,
+            Comment.vote_count,
+            Comment.is_pinned,
+            Comment.is_deleted,
+            User.id.label("user_id"),
+            User.display_name,
+            User.reputation,
+            has_voted.label("has_voted"),
+        )
+        .outerjoin(User, User.id == Comment.author_id)
+    )
+    if current_user_id:
+        query = query.outerjoin(Vote, and_(Vote.comment_id == Comment.id, Vote.user_id == current_user_id))
+    return query
+
+
+def comment_item(row):
+    has_author = row.user_id is not None
+    return {
+        "id": row.id,
+        "content": row.content,
+        "author_display_name": row.display_name if has_author else "Unknown",
+        "created_at": row.created_at,
+        "author_id": row.author_id,
+        "parent_id": row.parent_id,
+        "vote_count": row.vote_count or 0,  
+        "has_voted": bool(row.has_voted),
+        "is_pinned": row.is_pinned,
+        "badge": get_badge(row.reputation or 0) if has_author else None,
+        "is_deleted": row.is_deleted,
+    }
+
+
+def load_comment_page(
+    db: Session,
+    post_id: int,
+    parent_id: Optional[int],
+    cursor: Optional[str],
+    limit: int,
+    current_user_id: Optional[int] = None
+):
+    ensure_post_exists(db, post_id)
+    if parent_id is not None:
+        parent = db.query(Comment.id).filter(Comment.id == parent_id, Comment.post_id == post_id).first()
+        if not parent:
+            raise HTTPException(status_code=400, detail="Bình luận cha không hợp lệ")
+
+    query = (
+        comment_query(current_user_id)
+        .where(
+            Comment.post_id == post_id,
+            Comment.parent_id == parent_id if parent_id is not None else Comment.parent_id.is_(None)
+        )
+        .order_by(*[key.desc() for key in THREAD_ORDER])
+    )
+    if cursor:
+        last_key = decode_cursor("comments", cursor)
+        query = query.where(tuple_(*THREAD_ORDER) < tuple_(*last_key))
+    rows = db.execute(query.limit(limit)).all()
+
+    reply_counts = {}
+    if rows:
+        reply_counts = dict(
+            db.query(Comment.parent_id, func.count(Comment.id))
+            .filter(Comment.parent_id.in_([row.id for row in rows]))
+            .group_by(Comment.parent_id)
+        )
+
+    items = []
+    for row in rows:
+        item = comment_item(row)
+        item["reply_count"] = reply_counts.get(row.id, 0)
+        items.append(item)
+
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_cursor("comments", [last.is_pinned, last.vote_count, last.created_at, last.id])
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def iter_comment_lines(post_id: int, current_user_id: Optional[int] = None):
+    query = (
+        comment_query(current_user_id)
+        .where(Comment.post_id == post_id)
+        .order_by(Comment.created_at, Comment.id)
+        .execution_options(yield_per=COMMENT_STREAM_BATCH)
+    )
+
+    db = SessionLocal()
+    try:
+        for rows in db.execute(query).partitions():
+            lines = []
+            for row in rows:
+                lines.append(orjson.dumps(comment_item(row)))
+            yield b"\n".join(lines) + b"\n"
+    finally:
+        db.close()
+
+
+def load_comment_tree(db: Session, post_id: int, current_user_id: Optional[int] = None):
+    rows = db.execute(
+        comment_query(current_user_id)
+        .where(Comment.post_id == post_id)
+        .order_by(
+            Comment.is_pinned.desc(),
+            Comment.vote_count.desc(),
+            Comment.created_at.desc()
+        )
+    ).all()
+
+    # Các hàng đã được sắp xếp sẵn trong SQL nên mỗi nhánh con giữ nguyên thứ tự khi ghép cây
+    nodes = {}
+    for row in rows:
+        nodes[row.id] = comment_item(row)
+        nodes[row.id]["children"] = []
+
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node["parent_id"]) if node["parent_id"] else None
+        if parent:
+            parent["children"].append(node)
+        else:
+            roots.append(node)
+
+    return roots
+
+@router.post("/{comment_id}/vote", dependencies=[Depends(vote_rate_limit)])
 def vote_comment(
     comment_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
-    comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    comment = db.query(Comment.author_id, Comment.post_id).filter(Comment.id == comment_id).first()
     if not comment:
         raise HTTPException(status_code=404, detail="Bình luận không tồn tại")
 
-    vote_query = db.query(Vote).filter(
-        Vote.comment_id == comment_id, 
-        Vote.user_id == current_user.id
-    )
-    found_vote = vote_query.first()
+    delta = toggle_comment_vote(db, current_user.id, comment_id)
+    adjust_reputation(db, comment.author_id, delta)
+    vote_count = db.query(Comment.vote_count).filter(Comment.id == comment_id).scalar()
+    author_post_ids = commented_post_ids(db, comment.author_id) if delta else []
+    db.commit()
+    # vote_count của bình luận chỉ hiện ở bài chứa nó; uy tín tác giả đổi thì xóa thêm feed
+    # và danh sách bình luận của các bài tác giả từng bình luận
+    if author_post_ids:
+        invalidate_posts(set(author_post_ids) | {comment.post_id})
+    else:
+        invalidate_comments(comment.post_id)
+    notify_comment("comment_voted", comment.post_id, comment_id=comment_id, vote_count=vote_count)
 
-    if found_vote:
-        db.delete(found_vote)
-        if comment.author.reputation is None: comment.author.reputation = 0
-        comment.author.reputation -= 1  
-        db.commit()
+    if delta < 0:
         return {"message": "Đã bỏ thích", "vote_count": -1}
-    else:
-        new_vote = Vote(comment_id=comment_id, user_id=current_user.id)
-        db.add(new_vote)
-        if comment.author.reputation is None: comment.author.reputation = 0
-        comment.author.reputation += 1 
-        db.commit()
-        return {"message": "Đã thích", "vote_count": 1}
-
-@router.post("/create/{post_id}")
+    return {"message": "Đã thích", "vote_count": delta}
+
+@router.post("/create/{post_id}", dependencies=[Depends(comment_rate_limit)])
 def create_comment(
     post_id: int,
     data: CommentCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
-    post = db.query(Post).filter(Post.id == post_id).first()
+    post = db.query(Post.id).filter(Post.id == post_id).first()
     if not post:
         raise HTTPException(status_code=404, detail="Bài viết không tồn tại")
 
@@ -194,13 +379,22 @@ def create_comment(
     )
 
     db.add(new_comment)
-
-    if post.comment_count is None:
-        post.comment_count = 0
-    post.comment_count += 1
+    db.flush()
+    comment_count = bump_post_comments(db, post_id, 1)
+    refresh_hot_scores(db, [post_id])
 
     db.commit()
     db.refresh(new_comment)
+    invalidate_comments(post_id, feed=True)
+    notify_comment(
+        "comment_created",
+        post_id,
+        feed=True,
+        comment_id=new_comment.id,
+        parent_id=new_comment.parent_id,
+        author_id=current_user.id,
+        comment_count=comment_count
+    )
 
     return {
         "message": "Tạo bình luận thành công",
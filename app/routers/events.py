@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+from typing import Optional
+from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from app.utils.events import FEED_CHANNEL, broker, post_channel
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+# Số bài tối đa một kết nối WebSocket được theo dõi cùng lúc
+EVENTS_WS_MAX_SUBSCRIPTIONS = int(os.getenv("EVENTS_WS_MAX_SUBSCRIPTIONS", "50"))
+
+
+# true / false trong JSON là bool, lớp con của int trong Python: không phải id bài viết
+def is_post_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+# Server-Sent Events: luôn nhận sự kiện của feed, thêm ?post_id= để nhận cả bình luận / vote của bài đó
+@router.get("/stream")
+async def stream_events(request: Request, post_id: Optional[int] = None):
+    channels = [FEED_CHANNEL]
+    if post_id is not None:
+        channels.append(post_channel(post_id))
+    subscription = broker.subscribe(channels)
+
+    async def event_source():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.get(), EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# WebSocket: client gửi {"subscribe": <post_id>} / {"unsubscribe": <post_id>} để chọn bài cần theo dõi.
+# Lệnh sai (không phải JSON, vượt số bài tối đa) được trả lời bằng sự kiện "error", kết nối vẫn giữ
+@router.websocket("/ws")
+async def websocket_events(websocket: WebSocket):
+    await websocket.accept()
+    subscription = broker.subscribe([FEED_CHANNEL])
+
+    # Lỗi đi qua hàng đợi của subscription để chỉ có send_events gửi dữ liệu lên socket
+    def reply_error(detail: str):
+        subscription.offer({"type": "error", "detail": detail})
+
+    async def receive_commands():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            try:
+                command = json.loads(message.get("text") or message.get("bytes") or "")
+            except ValueError:
+                reply_error("Lệnh không phải JSON hợp lệ")
+                continue
+            if not isinstance(command, dict):
+                reply_error("Lệnh phải là một object JSON")
+                continue
+            post_id = command.get("subscribe")
+            if is_post_id(post_id):
+                channel = post_channel(post_id)
+                # Trừ kênh feed luôn có sẵn
+                if channel not in subscription.channels and len(subscription.channels) - 1 >= EVENTS_WS_MAX_SUBSCRIPTIONS:
+                    reply_error(f"Chỉ được theo dõi tối đa {EVENTS_WS_MAX_SUBSCRIPTIONS} bài viết")
+                else:
+                    subscription.subscribe(channel)
+            if is_post_id(command.get("unsubscribe")):
+                subscription.unsubscribe(post_channel(command["unsubscribe"]))
+
+    async def send_events():
+        while True:
+            await websocket.send_json(await subscription.get())
+
+    tasks = [asyncio.create_task(receive_commands()), asyncio.create_task(send_events())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+        subscription.close()
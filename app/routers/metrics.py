@@ -0,0 +1,42 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.database import pool_status
+from app.utils.cache import response_cache
+from app.utils.events import broker
+from app.utils.metrics import render_metrics
+from app.utils.principal_cache import principal_cache
+from app.utils.rate_limit import rate_limit_backend
+from app.utils.security import token_cache
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+# Định dạng text của Prometheus: độ trễ, số câu SQL, thời gian DB và số dòng theo từng route
+@router.get("", response_class=PlainTextResponse)
+def get_prometheus_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/pool")
+def get_pool_metrics():
+    return pool_status()
+
+
+@router.get("/auth-cache")
+def get_auth_cache_metrics():
+    return {"principals": principal_cache.stats(), "tokens": token_cache.stats()}
+
+
+@router.get("/rate-limit")
+def get_rate_limit_metrics():
+    return rate_limit_backend.stats()
+
+
+@router.get("/response-cache")
+def get_response_cache_metrics():
+    return response_cache.stats()
+
+
+@router.get("/events")
+def get_event_metrics():
+    return broker.stats()
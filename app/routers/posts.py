@@ -1,160 +1,184 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Header
-from sqlalchemy.orm import Session, joinedload
-from app.database import SessionLocal, get_db
-from app.models.models import Post, User, Vote, Comment
-from app.utils.security import create_access_token
-from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from app.database import get_db, get_async_db
+from app.models.models import Post, User, Vote
+from typing import List, Literal, Optional, Union
+from datetime import datetime
 from pydantic import BaseModel
-from sqlalchemy import func, case, exists, or_
-from app.utils.security import SECRET_KEY, ALGORITHM
+from sqlalchemy import and_, false, func, select, tuple_
+import os
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.search import search_posts
+from app.utils.votes import adjust_reputation, commented_post_ids, toggle_post_vote
+from app.utils.auth import get_current_user, get_current_user_optional
+from app.utils.principal_cache import Principal
+from app.utils.rate_limit import post_rate_limit, vote_rate_limit
+from app.utils.cache import invalidate_comments, invalidate_feed, invalidate_posts, not_modified, payload_etag, response_cache
+from app.utils.ranking import hot_score, refresh_hot_scores
+from app.utils.events import notify_post
+from app.schemas import FeedPage, PostDetail, PostItem
 
 router = APIRouter(prefix="/posts", tags=["Posts"])
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
-
 class PostCreate(BaseModel):
     title: str
     content: str
 class PostUpdate(BaseModel):
     title: str
     content: str
-def get_current_user_optional(
-    token: str = Depends(oauth2_scheme), 
-    db: Session = Depends(get_db)
-):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if username is None:
-            return None
-        return db.query(User).filter(User.username == username).first()
-    except:
-        return None
-
-@router.get("/")
-def get_posts(
+
+# ?preview=true: feed chỉ trả về đoạn đầu nội dung (cắt trong SQL), nội dung đầy đủ lấy ở GET /posts/{post_id}
+FEED_PREVIEW_LENGTH = int(os.getenv("FEED_PREVIEW_LENGTH", "300"))
+
+# Khóa sắp xếp của từng chế độ feed, tất cả đều giảm dần; Post.id là khóa phụ để cursor luôn duy nhất
+FEED_ORDERS = {
+    "hot": (Post.hot_score, Post.id),
+    "new": (Post.created_at, Post.id),
+    "top": (Post.vote_count, Post.id),
+}
+
+
+@router.get("/", response_model=Union[FeedPage, List[PostItem]])
+async def get_posts(
+    request: Request,
+    response: Response,
     skip: int = 0, 
     limit: int = 10, 
     search: Optional[str] = None, 
-    db: Session = Depends(get_db),
-    token: Optional[str] = Header(None, alias="Authorization")
+    cursor: Optional[str] = None,
+    sort: Literal["hot", "new", "top"] = "hot",
+    preview: bool = False,
+    db = Depends(get_async_db),
+    current_user: Optional[Principal] = Depends(get_current_user_optional)
 ):
-    current_user_id = None
-    if token:
-        try:
-            scheme, _, param = token.partition(" ")
-            actual_token = param if scheme.lower() == 'bearer' else token
-            
-            payload = jwt.decode(actual_token, SECRET_KEY, algorithms=[ALGORITHM])
-            username = payload.get("sub")
-            user = db.query(User).filter(User.username == username).first()
-            if user:
-                current_user_id = user.id
-        except:
-            pass 
-
-    search_filter = True
-    if search:
-        search_term = f"%{search}%"
-        search_filter = or_(
-            Post.title.ilike(search_term),
-            Post.content.ilike(search_term)
+    if current_user is None:
+        feed, etag = await response_cache.get_or_load(
+            "feed",
+            ("posts", skip, limit, search, cursor, sort, preview),
+            lambda: db.run_sync(load_feed, skip, limit, search, cursor, sort, None, preview)
         )
+    else:
+        feed = await db.run_sync(load_feed, skip, limit, search, cursor, sort, current_user.id, preview)
+        etag = payload_etag(feed)
+
+    unchanged = not_modified(request, response, etag, current_user.id if current_user else None)
+    if unchanged:
+        return unchanged
+    return feed
+
+
+def load_feed(
+    db: Session,
+    skip: int,
+    limit: int,
+    search: Optional[str],
+    cursor: Optional[str],
+    sort: str = "hot",
+    current_user_id: Optional[int] = None,
+    preview: bool = False
+):
+    hits = search_posts(db, search) if search else None
+    # Có chuỗi tìm kiếm nhưng không có từ nào (?search=!!!): không bài nào khớp, không trả về cả feed
+    if search and hits is None:
+        return {"items": [], "next_cursor": None} if cursor is not None else []
+    if hits is not None:
+        cursor_kind, order = "search", (hits.c.rank, Post.id)
+    else:
+        cursor_kind, order = sort, FEED_ORDERS[sort]
 
-    pinned_posts = []
-    if skip == 0:
-        pinned_posts = (
-            db.query(Post)
-            .join(Post.author)
-            .filter(Post.is_pinned == True) 
-            .filter(search_filter) 
+    def feed_query(*extra_columns):
+        query = select(*feed_columns(current_user_id, preview), *extra_columns).join(User, User.id == Post.author_id)
+        if current_user_id:
+            query = query.outerjoin(Vote, and_(Vote.post_id == Post.id, Vote.user_id == current_user_id))
+        if hits is not None:
+            query = query.join(hits, hits.c.post_id == Post.id)
+        return query
+
+    # cursor=None: phân trang kiểu cũ bằng skip/limit; cursor="" là trang đầu của chế độ cursor
+    use_cursor = cursor is not None
+    first_page = not cursor if use_cursor else skip == 0
+
+    pinned_rows = []
+    if first_page:
+        pinned_rows = db.execute(
+            feed_query()
+            .where(Post.is_pinned == True) 
             .order_by(Post.created_at.desc())
-            .all()
-        )
+        ).all()
 
-    regular_posts = (
-        db.query(Post)
-        .join(Post.author)
-        .filter(Post.is_pinned == False)
-        .filter(search_filter)
-        .options(joinedload(Post.author))
-        .order_by(
-            func.date(Post.created_at).desc(),    
-            case((User.role == "admin", 1), else_=0).desc(), 
-            User.reputation.desc(),                
-            Post.created_at.desc()               
-        )
-        .offset(skip) 
-        .limit(limit) 
-        .all()
+    regular_query = (
+        feed_query(*order)
+        .where(Post.is_pinned == False)
+        .order_by(*[key.desc() for key in order])
     )
+    if use_cursor:
+        if cursor:
+            last_key = decode_cursor(cursor_kind, cursor)
+            regular_query = regular_query.where(tuple_(*order) < tuple_(*last_key))
+    else:
+        regular_query = regular_query.offset(skip)
+    rows = db.execute(regular_query.limit(limit)).all()
 
-    posts = pinned_posts + regular_posts
+    results = build_feed(pinned_rows + rows)
 
+    if not use_cursor:
+        return results
 
-    results = []
-    for post in posts:
-        author_name = "Người dùng ẩn"
-        if post.author:
-            author_name = post.author.display_name or post.author.username
+    next_cursor = None
+    if rows and len(rows) == limit:
+        next_cursor = encode_cursor(cursor_kind, rows[-1][-len(order):])
+    return {"items": results, "next_cursor": next_cursor}
 
-        comment_count = db.query(Comment).filter(Comment.post_id == post.id).count()
 
-        vote_count = db.query(Vote).filter(Vote.post_id == post.id).count()
-        
-        has_voted = False
-        if current_user_id:
-            has_voted = db.query(exists().where(
-                Vote.post_id == post.id,
-                Vote.user_id == current_user_id
-            )).scalar()
-
-        results.append({
-            "id": post.id,
-            "title": post.title,
-            "content": post.content,
-            "created_at": post.created_at,
-            "author_id": post.author_id,
-            "author_name": author_name,
-            "reputation": post.author.reputation if post.author else 0,
-            "badge": get_badge(post.author.reputation) if post.author else None,
-            "is_pinned": post.is_pinned,
-            "vote_count": vote_count,  
-            "has_voted": has_voted,
-            "comment_count": comment_count
-        })
-        
-    return results
-
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-
-        if username is None:
-            raise HTTPException(status_code=401, detail="Mã thông báo không hợp lệ")
-
-        user = db.query(User).filter(User.username == username).first()
-
-        if not user:
-            raise HTTPException(status_code=401, detail="Người dùng không tìm thấy")
-
-        if user.is_banned:
-            raise HTTPException(status_code=403, detail="Người dùng bị cấm")
-
-        return user
-
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Mã thông báo không hợp lệ")
-
-
-@router.post("/create")
+# Chỉ lấy các cột feed cần, không nạp entity Post / User (nội dung đầy đủ, mật khẩu...) vào session
+def feed_columns(current_user_id: Optional[int] = None, preview: bool = False):
+    if preview:
+        content = func.substr(Post.content, 1, FEED_PREVIEW_LENGTH)
+        truncated = func.length(Post.content) > FEED_PREVIEW_LENGTH
+    else:
+        content, truncated = Post.content, false()
+    return (
+        Post.id,
+        Post.title,
+        content.label("content"),
+        truncated.label("content_truncated"),
+        Post.created_at,
+        Post.author_id,
+        User.display_name,
+        User.username,
+        User.reputation,
+        Post.is_pinned,
+        Post.vote_count,
+        Post.comment_count,
+        (Vote.id.is_not(None) if current_user_id else false()).label("has_voted"),
+    )
+
+
+def build_feed(rows):
+    return [
+        {
+            "id": row.id,
+            "title": row.title,
+            "content": row.content,
+            "content_truncated": bool(row.content_truncated),
+            "created_at": row.created_at,
+            "author_id": row.author_id,
+            "author_name": row.display_name or row.username,
+            "reputation": row.reputation,
+            "badge": get_badge(row.reputation or 0),
+            "is_pinned": row.is_pinned,
+            "vote_count": row.vote_count or 0,
+            "has_voted": bool(row.has_voted),
+            "comment_count": row.comment_count or 0
+        }
+        for row in rows
+    ]
+
+@router.post("/create", dependencies=[Depends(post_rate_limit)])
 def create_post(
     post: PostCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if len(post.title) > 200:
         raise HTTPException(status_code=400, detail="Tiêu đề quá dài (tối đa 200 ký tự)")
@@ -163,15 +187,22 @@ def create_post(
     if len(post.content) > 5000:
         raise HTTPException(status_code=400, detail="Nội dung bài viết quá dài (tối đa 5000 ký tự)")
     
+    # Uy tín đọc trực tiếp từ DB: principal trong cache không giữ reputation
+    reputation = db.query(User.reputation).filter(User.id == current_user.id).scalar()
+    created_at = datetime.utcnow()
     new_post = Post(
         title=post.title,
         content=post.content,
-        author_id=current_user.id
+        author_id=current_user.id,
+        created_at=created_at,
+        hot_score=hot_score(0, 0, created_at, reputation, current_user.role == "admin")
     )
 
     db.add(new_post)
     db.commit()
     db.refresh(new_post)
+    invalidate_feed()
+    notify_post("post_created", new_post.id, title=new_post.title, author_id=current_user.id)
 
     return {"message": "Đăng bài thành công", "id": new_post.id}
 
@@ -179,7 +210,7 @@ def create_post(
 def delete_post(
     post_id: int, 
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     post = db.query(Post).filter(Post.id == post_id).first()
     if not post:
@@ -188,6 +219,8 @@ def delete_post(
         raise HTTPException(status_code=403, detail="Bạn không có quyền xóa bài viết này")
     db.delete(post)
     db.commit()
+    invalidate_comments(post_id, feed=True)
+    notify_post("post_deleted", post_id)
 
     return {"message": "Xóa bài viết thành công"}
 
@@ -196,7 +229,7 @@ def update_post(
     post_id: int,
     post_update: PostUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     post = db.query(Post).filter(Post.id == post_id).first()
     
@@ -212,62 +245,53 @@ def update_post(
     post.content = post_update.content
     db.commit()
     db.refresh(post)
+    invalidate_feed()
+    notify_post("post_updated", post.id, title=post.title)
     return {"message": "Cập nhật bài viết thành công", "id": post.id}
 
-@router.get("/{post_id}")
-def get_post_detail(post_id: int, db: Session = Depends(get_db)):
-
-    post = db.query(Post).filter(Post.id == post_id).first()
+@router.get("/{post_id}", response_model=PostDetail)
+async def get_post_detail(post_id: int, request: Request, response: Response, db = Depends(get_async_db)):
+    query = select(*[getattr(Post, name) for name in PostDetail.model_fields]).where(Post.id == post_id)
+    post = await db.run_sync(lambda session: session.execute(query).first())
     
     if not post:
         raise HTTPException(status_code=404, detail="Bài viết không tồn tại")
-        
+
+    # ETag lấy từ chính hàng của bài viết: vote / bình luận / sửa ở bài khác không làm đổi
+    unchanged = not_modified(request, response, payload_etag(tuple(post)))
+    if unchanged:
+        return unchanged
     return post
 
-@router.post("/{post_id}/vote")
+@router.post("/{post_id}/vote", dependencies=[Depends(vote_rate_limit)])
 def vote_post(
     post_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
-    post = db.query(Post).filter(Post.id == post_id).first()
+    post = db.query(Post.author_id).filter(Post.id == post_id).first()
     if not post:
         raise HTTPException(status_code=404, detail="Bài viết không tồn tại")
 
-    vote_query = db.query(Vote).filter(
-        Vote.post_id == post_id, 
-        Vote.user_id == current_user.id
-    )
-    found_vote = vote_query.first()
-
-    if found_vote:
-        db.delete(found_vote)
-        
-        if post.author.reputation is None:
-            post.author.reputation = 0
-        
-        post.author.reputation -= 1  
-        
-        db.commit()
+    delta = toggle_post_vote(db, current_user.id, post_id)
+    adjust_reputation(db, post.author_id, delta)
+    refresh_hot_scores(db, [post_id])
+    vote_count = db.query(Post.vote_count).filter(Post.id == post_id).scalar()
+    author_post_ids = commented_post_ids(db, post.author_id) if delta else []
+    db.commit()
+    # Feed hiện vote_count và uy tín tác giả; huy hiệu tác giả còn hiện ở bình luận của họ trên các bài khác
+    invalidate_posts(author_post_ids)
+    notify_post("post_voted", post_id, vote_count=vote_count)
+
+    if delta < 0:
         return {"message": "Đã bỏ bình chọn"}
-        
-    else:
-        new_vote = Vote(post_id=post_id, user_id=current_user.id)
-        db.add(new_vote)
-        
-        if post.author.reputation is None:
-            post.author.reputation = 0
-            
-        post.author.reputation += 1
-        
-        db.commit()
-        return {"message": "Đã bình chọn thành công"}
+    return {"message": "Đã bình chọn thành công"}
 
 @router.put("/pin/{post_id}")
 def pin_post(
     post_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Bạn không phải admin")
@@ -278,6 +302,8 @@ def pin_post(
 
     post.is_pinned = True
     db.commit()
+    invalidate_feed()
+    notify_post("post_pinned", post_id, is_pinned=True)
 
     return {"message": f"Ghim bài viết {post.title} thành công"}
 
@@ -285,7 +311,7 @@ def pin_post(
 def unpin_post(
     post_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Bạn không phải admin")
@@ -296,6 +322,8 @@ def unpin_post(
 
     post.is_pinned = False
     db.commit()
+    invalidate_feed()
+    notify_post("post_pinned", post_id, is_pinned=False)
 
     return {"message": f"Bỏ ghim bài viết {post.title} thành công"}
 
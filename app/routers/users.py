@@ -1,9 +1,15 @@
+from typing import List
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models.models import User
-from app.routers.posts import get_current_user
-from app.utils.security import hash_password 
+from app.utils.auth import get_current_user, get_current_user_async
+from app.utils.security import hash_password_async
+from app.utils.principal_cache import Principal, invalidate_principal
+from app.utils.cache import invalidate_all
+from app.schemas import UserDetail, UserProfile
+from app.middleware import no_compression
 from pydantic import BaseModel
 
 
@@ -12,94 +18,87 @@ router = APIRouter(prefix="/users", tags=["Users"])
 class UserRoleUpdate(BaseModel):
     role: str
 
-@router.get("/")
+def user_columns(model):
+    return [getattr(User, name) for name in model.model_fields]
+
+@router.get("/", response_model=List[UserDetail])
 def read_users(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Bạn không phải admin")
 
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
-
-@router.get("/me")
-def read_users_me(current_user: User = Depends(get_current_user)):
-    return {
-        "id": current_user.id,
-        "username": current_user.username,    
-        "display_name": current_user.display_name, 
-        "email": current_user.email,
-        "reputation": current_user.reputation,  
-        "role": current_user.role,                
-        "is_banned": current_user.is_banned
-    }
-
-@router.get("/{user_id}")
+    return db.execute(select(*user_columns(UserDetail)).order_by(User.id).offset(skip).limit(limit)).all()
+
+@router.get("/me", response_model=UserDetail)
+@no_compression
+async def read_users_me(db = Depends(get_async_db), current_user: Principal = Depends(get_current_user_async)):
+    # Principal trong cache không có reputation: đọc bản ghi hiện tại
+    query = select(*user_columns(UserDetail)).where(User.id == current_user.id)
+    return await db.run_sync(lambda session: session.execute(query).first())
+
+@router.get("/{user_id}", response_model=UserProfile)
 def read_user_profile(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.execute(select(*user_columns(UserProfile)).where(User.id == user_id)).first()
     if not user:
         raise HTTPException(status_code=404, detail="User không tồn tại")
 
-    return {
-        "display_name": user.display_name,
-        "reputation": user.reputation,
-        "is_banned": user.is_banned
-    }
+    return user
 
 @router.put("/change-password")
-def change_password(
+async def change_password(
     new_password: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
 ):
     if len(new_password) < 6:
         raise HTTPException(status_code=400, detail="Mật khẩu quá ngắn")
 
-    current_user.password = hash_password(new_password)
-    db.commit()
+    await db.close()
+    hashed_password = await hash_password_async(new_password)
+    await db.run_sync(set_password, current_user.id, hashed_password)
+    invalidate_principal(current_user.id)
     return {"message": "Đổi mật khẩu thành công"}
 
+
+def set_password(db: Session, user_id: int, hashed_password: str):
+    user = db.get(User, user_id)
+    user.password = hashed_password
+    db.commit()
+
 @router.put("/update-profile")
 def update_profile(
     display_name: str | None = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
 
-    current_user.display_name = display_name
+    user = db.get(User, current_user.id)
+    user.display_name = display_name
 
     db.commit()
+    invalidate_principal(current_user.id)
+    invalidate_all()
     return {"message": "Cập nhật thông tin thành công"}
 
-@router.get("/all")
+@router.get("/all", response_model=List[UserDetail])
 def get_all_users(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Bạn không phải admin")
 
-    users = db.query(User).all()
-    return [
-        {
-            "id": u.id,
-            "username": u.username,
-            "email": u.email,
-            "display_name": u.display_name,
-            "role": u.role,
-            "is_banned": u.is_banned
-        }
-        for u in users
-    ]
+    return db.execute(select(*user_columns(UserDetail)).order_by(User.id)).all()
 
 @router.put("/ban/{user_id}")
 def ban_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Bạn không phải admin")
@@ -110,6 +109,7 @@ def ban_user(
 
     user.is_banned = True
     db.commit()
+    invalidate_principal(user.id)
 
     return {"message": f"Đã ban user {user.username}"}
 
@@ -117,7 +117,7 @@ def ban_user(
 def unban_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Bạn không phải admin")
@@ -128,6 +128,7 @@ def unban_user(
 
     user.is_banned = False
     db.commit()
+    invalidate_principal(user.id)
 
     return {"message": f"Đã unban user {user.username}"}
 
@@ -136,7 +137,7 @@ def update_user_role(
     user_id: int, 
     role_data: UserRoleUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Bạn không có quyền thực hiện hành động này")
@@ -153,5 +154,7 @@ def update_user_role(
 
     user.role = role_data.role
     db.commit()
+    invalidate_principal(user.id)
+    invalidate_all()
 
     return {"message": f"Đã cập nhật user {user.username} thành {user.role}"}
\ No newline at end of file
@@ -1,43 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models.models import Vote, Post, User
-from app.routers.posts import get_current_user
+from app.models.models import Post
+from app.utils.auth import get_current_user
+from app.utils.votes import adjust_reputation, commented_post_ids, toggle_post_vote
+from app.utils.principal_cache import Principal
+from app.utils.rate_limit import vote_rate_limit
+from app.utils.cache import invalidate_posts
+from app.utils.ranking import refresh_hot_scores
+from app.utils.events import notify_post
 
 router = APIRouter(prefix="/votes", tags=["Vote"])
 
-@router.post("/{post_id}", status_code=status.HTTP_201_CREATED)
-def vote(post_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    post = db.query(Post).filter(Post.id == post_id).first()
+@router.post("/{post_id}", status_code=status.HTTP_201_CREATED, dependencies=[Depends(vote_rate_limit)])
+def vote(post_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    post = db.query(Post.author_id).filter(Post.id == post_id).first()
     if not post:
         raise HTTPException(status_code=404, detail="Bài viết không tồn tại")
 
-    post_author = db.query(User).filter(User.id == post.author_id).first()
+    delta = toggle_post_vote(db, current_user.id, post_id)
+    is_own_post = post.author_id == current_user.id
+    if not is_own_post:
+        adjust_reputation(db, post.author_id, delta)
+    refresh_hot_scores(db, [post_id])
+    vote_count = db.query(Post.vote_count).filter(Post.id == post_id).scalar()
+    author_post_ids = commented_post_ids(db, post.author_id) if delta and not is_own_post else []
+    db.commit()
+    # Feed hiện vote_count và uy tín tác giả; huy hiệu tác giả còn hiện ở bình luận của họ trên các bài khác
+    invalidate_posts(author_post_ids)
+    notify_post("post_voted", post_id, vote_count=vote_count)
 
-    vote_query = db.query(Vote).filter(Vote.post_id == post_id, Vote.user_id == current_user.id)
-    found_vote = vote_query.first()
-
-    if found_vote:
-        vote_query.delete(synchronize_session=False)
-        
-        if post_author and post.author_id != current_user.id:
-            post_author.reputation -= 1
-        
-        db.commit()
+    if delta < 0:
         return {"message": "Đã bỏ like"}
-
-    else:
-        if post.author_id == current_user.id:
-             new_vote = Vote(post_id=post_id, user_id=current_user.id)
-             db.add(new_vote)
-             db.commit()
-             return {"message": "Đã like (Không cộng điểm cho bài viết của chính bạn)"}
-
-        new_vote = Vote(post_id=post_id, user_id=current_user.id)
-        db.add(new_vote)
-        
-        if post_author:
-            post_author.reputation += 1
-            
-        db.commit()
-        return {"message": "Đã like thành công"}
\ No newline at end of file
+    if is_own_post:
+        return {"message": "Đã like (Không cộng điểm cho bài viết của chính bạn)"}
+    return {"message": "Đã like thành công"}
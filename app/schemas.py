@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from typing import List, Optional
 
 class UserCreate(BaseModel):
     username: str = Field(min_length=3, max_length=30)
@@ -15,3 +16,88 @@ class PostCreate(BaseModel):
     title: str
     content: str
 
+
+
+# --- Response model cho các route đọc ---
+# from_attributes: đọc được trực tiếp từ Row của SQLAlchemy (theo tên cột / label) lẫn dict,
+# pydantic-core kiểm tra và chuyển sang JSON mà không cần jsonable_encoder
+class ReadModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+
+class Badge(ReadModel):
+    name: str
+    color: str
+
+
+class PostItem(ReadModel):
+    id: int
+    title: str
+    content: str
+    content_truncated: bool = False
+    created_at: Optional[datetime]
+    author_id: Optional[int]
+    author_name: str
+    reputation: Optional[int]
+    badge: Optional[Badge]
+    is_pinned: Optional[bool]
+    vote_count: int
+    has_voted: bool
+    comment_count: int
+
+
+class FeedPage(ReadModel):
+    items: List[PostItem]
+    next_cursor: Optional[str]
+
+
+class PostDetail(ReadModel):
+    id: int
+    title: str
+    content: str
+    author_id: Optional[int]
+    created_at: Optional[datetime]
+    is_pinned: Optional[bool]
+    comment_count: Optional[int]
+    vote_count: Optional[int]
+    hot_score: float
+
+
+class CommentItem(ReadModel):
+    id: int
+    content: str
+    author_display_name: Optional[str]
+    created_at: Optional[datetime]
+    author_id: Optional[int]
+    parent_id: Optional[int]
+    vote_count: int
+    has_voted: bool
+    is_pinned: Optional[bool]
+    badge: Optional[Badge]
+    is_deleted: Optional[bool]
+
+
+class CommentNode(CommentItem):
+    children: List["CommentNode"] = []
+
+
+class CommentPageItem(CommentItem):
+    reply_count: int
+
+
+class CommentPage(ReadModel):
+    items: List[CommentPageItem]
+    next_cursor: Optional[str]
+
+
+class UserProfile(ReadModel):
+    display_name: Optional[str]
+    reputation: Optional[int]
+    is_banned: Optional[bool]
+
+
+class UserDetail(UserProfile):
+    id: int
+    username: str
+    email: Optional[str]
+    role: Optional[str]
@@ -0,0 +1,64 @@
+from typing import Optional
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError
+from sqlalchemy.orm import Session
+
+from app.database import get_async_db, get_db
+from app.utils.principal_cache import Principal, cached_principal, fetch_principal, load_principal
+from app.utils.security import decode_access_token
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
+
+
+def decode_token(token: str) -> dict:
+    try:
+        payload = decode_access_token(token)
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Mã thông báo không hợp lệ")
+    if payload.get("sub") is None and payload.get("id") is None:
+        raise HTTPException(status_code=401, detail="Mã thông báo không hợp lệ")
+    return payload
+
+
+def check_principal(user: Optional[Principal]) -> Principal:
+    if not user:
+        raise HTTPException(status_code=401, detail="Người dùng không tìm thấy")
+    if user.is_banned:
+        raise HTTPException(status_code=403, detail="Người dùng bị cấm")
+    return user
+
+
+def authenticate(db: Session, token: str) -> Principal:
+    return check_principal(load_principal(db, decode_token(token)))
+
+
+# --- Bắt buộc đăng nhập ---
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return authenticate(db, token)
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db = Depends(get_async_db)):
+    payload = decode_token(token)
+    user = cached_principal(payload)
+    if user is None:
+        user = await db.run_sync(fetch_principal, payload)
+    return check_principal(user)
+
+
+# --- Không bắt buộc đăng nhập: token thiếu / sai / hết hạn đều coi như khách ---
+async def get_current_user_optional(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    db = Depends(get_async_db)
+) -> Optional[Principal]:
+    if not token:
+        return None
+    try:
+        payload = decode_token(token)
+    except HTTPException:
+        return None
+    user = cached_principal(payload)
+    if user is None:
+        user = await db.run_sync(fetch_principal, payload)
+    return user
@@ -0,0 +1,171 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+import orjson
+from fastapi import Request, Response
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "10"))
+
+# Namespace chung cho mọi key: đổi khi dữ liệu hiển thị ở mọi nơi thay đổi (tên hiển thị, điểm uy tín)
+GLOBAL_NAMESPACE = "all"
+
+
+# Store cần có get(key), set(key, value, ttl), incr(key) và counter(key); một store dùng chung
+# (Redis, memcached...) cài đặt các hàm này là các worker cùng thấy dữ liệu và lệnh xóa cache của nhau
+class MemoryCacheStore:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def incr(self, key: str):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key: str):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Cache kết quả của các route đọc cho khách. Xóa cache bằng cách tăng "thế hệ" của namespace:
+# key cũ không còn được dùng tới và tự hết hạn/bị đẩy ra khỏi LRU.
+# Mỗi entry là (dữ liệu, ETag): ETag tính một lần khi nạp, lần đọc sau trả 304 mà không cần serialize
+class ResponseCache:
+    def __init__(self, store, ttl: float):
+        self.store = store
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def generation(self, namespace: str):
+        return self.store.counter("gen:" + namespace)
+
+    def key(self, namespace: str, *parts):
+        stamp = (self.generation(GLOBAL_NAMESPACE), self.generation(namespace))
+        return repr((namespace, stamp) + parts)
+
+    async def get_or_load(self, namespace: str, parts: tuple, loader):
+        key = self.key(namespace, *parts)
+        entry = self.store.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        value = await loader()
+        entry = (value, payload_etag(value))
+        self.store.set(key, entry, self.ttl)
+        return entry
+
+    def invalidate(self, *namespaces: str):
+        for namespace in namespaces:
+            self.store.incr("gen:" + namespace)
+        self.invalidations += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self.store),
+            "maxsize": getattr(self.store, "maxsize", None),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+            "invalidations": self.invalidations,
+        }
+
+
+response_cache = ResponseCache(MemoryCacheStore(RESPONSE_CACHE_SIZE), RESPONSE_CACHE_TTL)
+
+
+def comments_namespace(post_id: int):
+    return f"comments:{post_id}"
+
+
+# Bài viết thay đổi (tạo, sửa, xóa, ghim, vote)
+def invalidate_feed():
+    response_cache.invalidate("feed")
+
+
+# Bình luận thay đổi; thêm/xóa bình luận còn đổi comment_count trên feed
+def invalidate_comments(post_id: int, feed: bool = False):
+    if feed:
+        response_cache.invalidate(comments_namespace(post_id), "feed")
+    else:
+        response_cache.invalidate(comments_namespace(post_id))
+
+
+# Thao tác hàng loạt: xóa cache feed và bình luận của mọi bài bị ảnh hưởng trong một lần
+def invalidate_posts(post_ids):
+    response_cache.invalidate("feed", *(comments_namespace(post_id) for post_id in post_ids))
+
+
+def invalidate_all():
+    response_cache.invalidate(GLOBAL_NAMESPACE)
+
+
+# --- ETag / GET có điều kiện ---
+# ETag là băm của chính dữ liệu trả về: chỉ đổi khi dữ liệu đổi, giống nhau giữa các worker và sau khi
+# khởi động lại. Với khách, ETag được lưu cùng entry trong response_cache nên chỉ tính khi nạp lại
+def payload_etag(payload):
+    return f'W/"{hashlib.blake2b(orjson.dumps(payload), digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+# Gắn ETag + Cache-Control vào response; trả về 304 khi client đã có bản mới nhất (không cần gửi lại body)
+def not_modified(request: Request, response: Response, etag: str, viewer_id: Optional[int] = None):
+    if viewer_id is None:
+        cache_control = f"public, max-age={int(response_cache.ttl)}"
+    else:
+        cache_control = "private, no-cache"
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Authorization"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
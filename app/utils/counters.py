@@ -0,0 +1,106 @@
+from typing import Iterable, Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.models.models import Comment, Post, Vote
+from app.utils.cache import invalidate_comments, invalidate_feed
+from app.utils.ranking import refresh_hot_scores
+
+
+def bump_post_votes(db: Session, post_id: int, delta: int):
+    db.execute(
+        update(Post)
+        .where(Post.id == post_id)
+        .values(vote_count=func.coalesce(Post.vote_count, 0) + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def bump_comment_votes(db: Session, comment_id: int, delta: int):
+    db.execute(
+        update(Comment)
+        .where(Comment.id == comment_id)
+        .values(vote_count=func.coalesce(Comment.vote_count, 0) + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Cộng / trừ comment_count ngay trong câu UPDATE như vote_count, không để xuống dưới 0.
+# Trả về giá trị mới, None nếu bài không tồn tại (hoặc đã về 0 khi trừ)
+def bump_post_comments(db: Session, post_id: int, delta: int):
+    new_count = func.coalesce(Post.comment_count, 0) + delta
+    query = update(Post).where(Post.id == post_id)
+    if delta < 0:
+        query = query.where(new_count >= 0)
+    return db.execute(
+        query
+        .values(comment_count=new_count)
+        .returning(Post.comment_count)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+
+# Số bình luận chưa bị xóa của bài viết, dùng làm giá trị trong UPDATE posts
+def live_comment_count():
+    return (
+        select(func.count(Comment.id))
+        .where(Comment.post_id == Post.id, Comment.is_deleted.is_not(True))
+        .scalar_subquery()
+    )
+
+
+# Sửa bộ đếm lệch so với dữ liệu thật, tính lại điểm hot của các bài vừa sửa và xóa cache liên quan.
+# refresh_scores=False khi schema chưa có cột hot_score (dữ liệu nạp trước migration 0005_hot_ranking)
+def reconcile_counters(db: Session, post_ids: Optional[Iterable[int]] = None, refresh_scores: bool = True):
+    post_votes = (
+        select(func.count(Vote.id)).where(Vote.post_id == Post.id).scalar_subquery()
+    )
+    post_comments = live_comment_count()
+    comment_votes = (
+        select(func.count(Vote.id)).where(Vote.comment_id == Comment.id).scalar_subquery()
+    )
+
+    fix_posts = (
+        update(Post)
+        .where(
+            Post.vote_count.is_distinct_from(post_votes)
+            | Post.comment_count.is_distinct_from(post_comments)
+        )
+        .values(vote_count=post_votes, comment_count=post_comments)
+        .returning(Post.id)
+        .execution_options(synchronize_session=False)
+    )
+    fix_comments = (
+        update(Comment)
+        .where(Comment.vote_count.is_distinct_from(comment_votes))
+        .values(vote_count=comment_votes)
+        .returning(Comment.post_id)
+        .execution_options(synchronize_session=False)
+    )
+    if post_ids is not None:
+        post_ids = list(post_ids)
+        fix_posts = fix_posts.where(Post.id.in_(post_ids))
+        fix_comments = fix_comments.where(Comment.post_id.in_(post_ids))
+
+    fixed_posts = db.execute(fix_posts).scalars().all()
+    fixed_comment_posts = db.execute(fix_comments).scalars().all()
+    if refresh_scores:
+        refresh_hot_scores(db, fixed_posts)
+    db.commit()
+
+    if fixed_posts:
+        invalidate_feed()
+    for post_id in set(fixed_comment_posts) - {None}:
+        invalidate_comments(post_id)
+    return {"posts_fixed": len(fixed_posts), "comments_fixed": len(fixed_comment_posts)}
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        result = reconcile_counters(db)
+    finally:
+        db.close()
+    print(f"Đã sửa bộ đếm của {result['posts_fixed']} bài viết và {result['comments_fixed']} bình luận")
@@ -0,0 +1,268 @@
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+from typing import Iterable
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "local").lower()
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_PG_CHANNEL = "forum_events"
+# pg_notify từ chối payload từ 8000 byte trở lên
+PG_NOTIFY_MAX_BYTES = 7999
+# Các trường giữ lại khi sự kiện quá lớn: đủ để client biết cần tải lại gì
+EVENT_ID_KEYS = ("type", "post_id", "post_ids", "comment_id")
+
+FEED_CHANNEL = "feed"
+
+
+def post_channel(post_id: int):
+    return f"post:{post_id}"
+
+
+# Hàng đợi của một client (tab SSE / kết nối WebSocket), luôn được thao tác trên event loop của nó.
+# Client đọc chậm làm đầy hàng đợi: bỏ toàn bộ sự kiện đang chờ và thay bằng một sự kiện "lagged"
+# để client tự tải lại dữ liệu, thay vì để bộ nhớ tăng không giới hạn
+class Subscription:
+    def __init__(self, broker, channels: Iterable[str], maxsize: int):
+        self.broker = broker
+        self.channels = set(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def offer(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            lost = self.queue.qsize() + 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.dropped += lost
+            self.broker.dropped += lost
+            self.queue.put_nowait({"type": "lagged", "dropped": lost})
+
+    async def get(self):
+        return await self.queue.get()
+
+    def subscribe(self, channel: str):
+        self.broker.add_channel(self, channel)
+
+    def unsubscribe(self, channel: str):
+        self.broker.remove_channel(self, channel)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    def __init__(self, queue_size: int):
+        self.backend = None
+        self.queue_size = queue_size
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self._channels = {}
+        self._listeners = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.backend.start()
+
+    def stop(self):
+        self.backend.stop()
+
+    def subscribe(self, channels: Iterable[str]):
+        subscription = Subscription(self, channels, self.queue_size)
+        with self._lock:
+            for channel in subscription.channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def add_channel(self, subscription: Subscription, channel: str):
+        with self._lock:
+            subscription.channels.add(channel)
+            self._channels.setdefault(channel, set()).add(subscription)
+
+    def remove_channel(self, subscription: Subscription, channel: str):
+        with self._lock:
+            subscription.channels.discard(channel)
+            self._discard(subscription, channel)
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                self._discard(subscription, channel)
+
+    # Hàm xử lý trong chính tiến trình (không phải client) cho một kênh, vd. xóa cache khi worker khác đổi dữ liệu.
+    # Được gọi ngay trên thread nhận sự kiện nên phải nhanh và không chặn
+    def add_listener(self, channel: str, callback):
+        with self._lock:
+            self._listeners.setdefault(channel, []).append(callback)
+
+    def _discard(self, subscription: Subscription, channel: str):
+        subscribers = self._channels.get(channel)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._channels[channel]
+
+    # Gọi được từ bất kỳ thread nào (các route ghi là hàm sync chạy trong threadpool).
+    # Dữ liệu đã commit nên lỗi khi phát sự kiện chỉ được ghi lại, không làm hỏng request
+    def publish(self, channels: Iterable[str], event: dict):
+        self.published += 1
+        try:
+            self.backend.publish(list(channels), event)
+        except Exception as e:
+            logger.exception("Lỗi khi phát sự kiện %s: %s", event.get("type"), e)
+
+    # Phát tới các client của worker này; backend gọi hàm này khi nhận được sự kiện
+    def deliver(self, channels: Iterable[str], event: dict):
+        with self._lock:
+            targets = set()
+            callbacks = []
+            for channel in channels:
+                targets.update(self._channels.get(channel, ()))
+                callbacks.extend(self._listeners.get(channel, ()))
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.exception("Lỗi khi xử lý sự kiện %s: %s", event.get("type"), e)
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # event loop của client đã đóng
+                continue
+        self.delivered += len(targets)
+
+    def stats(self):
+        with self._lock:
+            subscribers = set()
+            for members in self._channels.values():
+                subscribers.update(members)
+            channels = len(self._channels)
+        return {
+            "backend": self.backend.name,
+            "subscribers": len(subscribers),
+            "channels": channels,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+# Backend nhận hàm deliver của broker, cần có name, start(), stop() và publish(channels, event).
+# local: chỉ phát trong tiến trình hiện tại (một worker)
+class LocalEventBackend:
+    name = "local"
+
+    def __init__(self, deliver):
+        self.deliver = deliver
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def publish(self, channels, event):
+        self.deliver(channels, event)
+
+
+# postgres: phát qua NOTIFY, mỗi worker LISTEN trên một connection riêng trong thread nền
+# rồi chuyển tiếp cho client của mình; không cần thêm dịch vụ nào ngoài database
+class PostgresEventBackend:
+    name = "postgres"
+
+    def __init__(self, deliver, engine):
+        self.deliver = deliver
+        self.engine = engine
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._listen, name="event-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def publish(self, channels, event):
+        payload = json.dumps({"channels": channels, "event": event}, default=str)
+        if len(payload.encode()) > PG_NOTIFY_MAX_BYTES:
+            logger.warning("Sự kiện %s quá lớn cho NOTIFY (%d byte), chỉ gửi id", event.get("type"), len(payload.encode()))
+            event = {key: event[key] for key in EVENT_ID_KEYS if key in event}
+            payload = json.dumps({"channels": channels, "event": event}, default=str)
+        with self.engine.begin() as conn:
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": EVENTS_PG_CHANNEL, "payload": payload})
+
+    def _listen(self):
+        while not self._stopping.is_set():
+            try:
+                connection = self.engine.raw_connection()
+            except Exception as e:
+                logger.warning("Không kết nối được tới kênh sự kiện: %s", e)
+                self._stopping.wait(5)
+                continue
+            try:
+                dbapi_connection = connection.driver_connection
+                dbapi_connection.autocommit = True
+                dbapi_connection.cursor().execute(f"LISTEN {EVENTS_PG_CHANNEL}")
+                while not self._stopping.is_set():
+                    if select.select([dbapi_connection], [], [], 1.0) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        message = json.loads(dbapi_connection.notifies.pop(0).payload)
+                        self.deliver(message["channels"], message["event"])
+            except Exception as e:
+                logger.warning("Mất kết nối kênh sự kiện, đang kết nối lại: %s", e)
+                self._stopping.wait(1)
+            finally:
+                connection.invalidate()
+
+
+def create_backend(deliver):
+    if EVENTS_BACKEND == "postgres":
+        from app.database import engine
+        return PostgresEventBackend(deliver, engine)
+    return LocalEventBackend(deliver)
+
+
+broker = EventBroker(EVENTS_QUEUE_SIZE)
+broker.backend = create_backend(broker.deliver)
+
+
+# --- Các sự kiện phát ra từ route ghi ---
+# Sự kiện về bài viết: tới feed và kênh riêng của bài
+def notify_post(event_type: str, post_id: int, **data):
+    broker.publish([FEED_CHANNEL, post_channel(post_id)], {"type": event_type, "post_id": post_id, **data})
+
+
+# Sự kiện về bình luận: chỉ tới kênh của bài; thêm / xóa bình luận đổi comment_count nên gửi cả feed
+def notify_comment(event_type: str, post_id: int, feed: bool = False, **data):
+    channels = [post_channel(post_id)]
+    if feed:
+        channels.append(FEED_CHANNEL)
+    broker.publish(channels, {"type": event_type, "post_id": post_id, **data})
+
+
+# Sự kiện cho thao tác hàng loạt: gộp nhiều bài vào một sự kiện (chia lô để payload NOTIFY không quá lớn)
+NOTIFY_BATCH_SIZE = 200
+
+
+def notify_posts(event_type: str, post_ids: Iterable[int], **data):
+    post_ids = list(post_ids)
+    for start in range(0, len(post_ids), NOTIFY_BATCH_SIZE):
+        chunk = post_ids[start:start + NOTIFY_BATCH_SIZE]
+        channels = [FEED_CHANNEL] + [post_channel(post_id) for post_id in chunk]
+        broker.publish(channels, {"type": event_type, "post_ids": chunk, **data})
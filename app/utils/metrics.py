@@ -0,0 +1,167 @@
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Câu SQL chạy lâu hơn ngưỡng này (ms) được ghi log cảnh báo
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG_CHARS = 1000
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+ROW_COUNT_BUCKETS = (0, 1, 10, 100, 1000, 10000)
+
+
+# Số liệu của một request, lưu trong contextvar: threadpool (route sync, run_sync) và greenlet của
+# AsyncSession đều chạy trên bản sao context nên cùng ghi vào một đối tượng
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _label_text(names, values):
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, labels, buckets):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+            for label_values, (counts, total, count) in series:
+                labels = _label_text(self.labels, label_values)
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {bucket_count}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"{self.name}_sum{{{labels}}} {total}")
+                lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                labels = _label_text(self.labels, label_values)
+                lines.append(f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}")
+        return lines
+
+
+ROUTE_LABELS = ("method", "route")
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Thời gian xử lý request", ROUTE_LABELS, LATENCY_BUCKETS
+)
+request_queries = Histogram(
+    "http_request_db_queries", "Số câu SQL mỗi request", ROUTE_LABELS, QUERY_COUNT_BUCKETS
+)
+request_db_time = Histogram(
+    "http_request_db_seconds", "Tổng thời gian chạy SQL mỗi request", ROUTE_LABELS, LATENCY_BUCKETS
+)
+request_rows = Histogram(
+    "http_request_db_rows", "Số dòng SQL trả về / bị ảnh hưởng mỗi request (theo cursor.rowcount)",
+    ROUTE_LABELS, ROW_COUNT_BUCKETS
+)
+requests_total = Counter("http_requests_total", "Số request theo route và mã trạng thái", ROUTE_LABELS + ("status",))
+slow_queries_total = Counter("db_slow_queries_total", "Số câu SQL chạy lâu hơn SLOW_QUERY_MS")
+
+METRICS = (request_duration, request_queries, request_db_time, request_rows, requests_total, slow_queries_total)
+
+
+def observe_request(method: str, route: str, status: int, stats: RequestStats):
+    request_duration.observe(stats.elapsed(), method, route)
+    request_queries.observe(stats.queries, method, route)
+    request_db_time.observe(stats.db_seconds, method, route)
+    request_rows.observe(stats.rows, method, route)
+    requests_total.inc(method, route, status)
+
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Hook SQLAlchemy ---
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        # SELECT trên SQLite luôn báo -1; PostgreSQL báo đúng số dòng trả về
+        stats.rows += max(cursor.rowcount, 0)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        slow_queries_total.inc()
+        logger.warning(
+            "Câu SQL chậm (%.1f ms): %s",
+            elapsed * 1000,
+            " ".join(statement.split())[:SLOW_QUERY_LOG_CHARS]
+        )
+
+
+# Câu lệnh lỗi không đi qua after_cursor_execute: bỏ mốc thời gian còn treo
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def instrument_engine(engine):
+    if engine is None:
+        return
+    engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
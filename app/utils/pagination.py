@@ -0,0 +1,66 @@
+import base64
+import json
+import math
+from datetime import date, datetime
+from fastapi import HTTPException
+
+# Kiểu của từng giá trị trong cursor theo loại cursor, khớp với khóa sắp xếp tương ứng
+# (FEED_ORDERS và rank tìm kiếm trong app.routers.posts, THREAD_ORDER trong app.routers.comments)
+NUMBER = "number"
+CURSOR_TYPES = {
+    "hot": (NUMBER, int),
+    "new": (datetime, int),
+    "top": (int, int),
+    "search": (NUMBER, int),
+    "comments": (bool, int, datetime, int),
+}
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        raise ValueError("unknown cursor value")
+    return value
+
+
+# bool là lớp con của int trong Python nhưng không phải giá trị hợp lệ cho cột số
+def _check_type(value, expected):
+    if expected is bool:
+        return isinstance(value, bool)
+    if isinstance(value, bool):
+        return False
+    if expected is NUMBER:
+        return isinstance(value, (int, float)) and math.isfinite(value)
+    return isinstance(value, expected)
+
+
+def encode_cursor(kind: str, values):
+    payload = {"k": kind, "v": [_encode_value(v) for v in values]}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(kind: str, cursor: str):
+    types = CURSOR_TYPES[kind]
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = [_decode_value(v) for v in payload["v"]]
+        if payload["k"] != kind or len(values) != len(types):
+            raise ValueError("cursor mismatch")
+        if not all(_check_type(value, expected) for value, expected in zip(values, types)):
+            raise ValueError("cursor value type mismatch")
+        return values
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+from sqlalchemy.orm import Session
+
+from app.models.models import User
+from app.utils.events import NOTIFY_BATCH_SIZE, broker
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+# Kênh của event broker báo các worker xóa principal đã đổi (ban, đổi quyền, đổi mật khẩu...)
+PRINCIPAL_CHANNEL = "principals"
+
+
+# Ảnh chụp các trường của User mà các route cần, không gắn với session nào.
+# Không chứa reputation: điểm uy tín đổi theo từng vote nên phải đọc trực tiếp từ DB
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: str
+    display_name: Optional[str]
+    email: Optional[str]
+    role: str
+    is_banned: bool
+
+    @classmethod
+    def from_user(cls, user: User):
+        return cls(
+            id=user.id,
+            username=user.username,
+            display_name=user.display_name,
+            email=user.email,
+            role=user.role,
+            is_banned=bool(user.is_banned),
+        )
+
+
+class PrincipalCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, principal: Principal):
+        with self._lock:
+            self._entries[principal.id] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+
+# Gọi sau khi commit thay đổi của user: xóa ngay ở worker này rồi phát qua event broker để các worker khác
+# cũng xóa (EVENTS_BACKEND=postgres); ban / đổi quyền nhờ vậy có hiệu lực ngay thay vì chờ hết TTL
+def invalidate_principals(user_ids: Iterable[int]):
+    user_ids = list(user_ids)
+    for user_id in user_ids:
+        principal_cache.invalidate(user_id)
+    for start in range(0, len(user_ids), NOTIFY_BATCH_SIZE):
+        broker.publish(
+            [PRINCIPAL_CHANNEL],
+            {"type": "principals_invalidated", "user_ids": user_ids[start:start + NOTIFY_BATCH_SIZE]}
+        )
+
+
+def invalidate_principal(user_id: int):
+    invalidate_principals([user_id])
+
+
+def _on_principals_invalidated(event: dict):
+    for user_id in event["user_ids"]:
+        principal_cache.invalidate(user_id)
+
+
+broker.add_listener(PRINCIPAL_CHANNEL, _on_principals_invalidated)
+
+
+def cached_principal(payload: dict) -> Optional[Principal]:
+    user_id = payload.get("id")
+    if user_id is None:
+        return None
+    return principal_cache.get(user_id)
+
+
+# Tìm principal theo claim "id" của token (token cũ không có "id" thì tìm theo username)
+def fetch_principal(db: Session, payload: dict) -> Optional[Principal]:
+    user_id = payload.get("id")
+    if user_id is not None:
+        user = db.get(User, user_id)
+    else:
+        username = payload.get("sub")
+        if username is None:
+            return None
+        user = db.query(User).filter(User.username == username).first()
+
+    if user is None:
+        return None
+    principal = Principal.from_user(user)
+    principal_cache.put(principal)
+    return principal
+
+
+def load_principal(db: Session, payload: dict) -> Optional[Principal]:
+    return cached_principal(payload) or fetch_principal(db, payload)
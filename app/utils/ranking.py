@@ -0,0 +1,80 @@
+import math
+import os
+from datetime import datetime
+from typing import Iterable, Optional
+from sqlalchemy import bindparam, select
+
+from app.models.models import Post, User
+
+# Điểm "hot" kiểu Reddit: log của lượt tương tác cộng với tuổi bài viết tính theo HOT_DECAY_SECONDS.
+# Phần thời gian tăng dần theo created_at nên điểm không phụ thuộc vào "bây giờ": chỉ cần tính lại
+# khi vote / bình luận / uy tín tác giả thay đổi, và bài mới tự vượt lên bài cũ
+HOT_EPOCH = datetime(2024, 1, 1)
+HOT_DECAY_SECONDS = float(os.getenv("HOT_DECAY_SECONDS", "45000"))
+COMMENT_WEIGHT = 2
+REPUTATION_WEIGHT = 0.5
+ADMIN_BOOST = 1.0
+
+
+def hot_score(
+    vote_count: Optional[int],
+    comment_count: Optional[int],
+    created_at: Optional[datetime],
+    author_reputation: Optional[int] = 0,
+    author_is_admin: bool = False,
+):
+    engagement = max(vote_count or 0, 0) + COMMENT_WEIGHT * max(comment_count or 0, 0)
+    score = math.log10(max(engagement, 1))
+    score += REPUTATION_WEIGHT * math.log10(1 + max(author_reputation or 0, 0))
+    if author_is_admin:
+        score += ADMIN_BOOST
+    age = ((created_at or HOT_EPOCH) - HOT_EPOCH).total_seconds()
+    return round(score + age / HOT_DECAY_SECONDS, 7)
+
+
+# Tính lại điểm cho các bài chỉ định (hoặc toàn bộ, theo từng lô id); chỉ ghi những bài có điểm đổi.
+# db có thể là Session hoặc Connection
+def refresh_hot_scores(db, post_ids: Optional[Iterable[int]] = None, chunk_size: int = 1000):
+    query = (
+        select(
+            Post.id,
+            Post.hot_score,
+            Post.vote_count,
+            Post.comment_count,
+            Post.created_at,
+            User.reputation,
+            User.role,
+        )
+        .outerjoin(User, User.id == Post.author_id)
+        .order_by(Post.id)
+        .limit(chunk_size)
+    )
+    if post_ids is not None:
+        post_ids = list(post_ids)
+        if not post_ids:
+            return 0
+        query = query.where(Post.id.in_(post_ids))
+
+    posts = Post.__table__
+    write = (
+        posts.update()
+        .where(posts.c.id == bindparam("post_id"))
+        .values(hot_score=bindparam("score"))
+    )
+
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.execute(query.where(Post.id > last_id)).all()
+        if not rows:
+            break
+        changes = []
+        for row in rows:
+            score = hot_score(row.vote_count, row.comment_count, row.created_at, row.reputation, row.role == "admin")
+            if row.hot_score != score:
+                changes.append({"post_id": row.id, "score": score})
+        if changes:
+            db.execute(write, changes)
+            updated += len(changes)
+        last_id = rows[-1].id
+    return updated
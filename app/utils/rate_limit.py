@@ -1,44 +1,227 @@
+import math
+import os
+import threading
 import time
-from fastapi import HTTPException, status
+from collections import OrderedDict, deque
+from itertools import islice
+from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, insert, select, text
 
-FAILED_ATTEMPTS = {}
+from app.database import engine
+from app.models.models import RateLimitHit
+from app.utils.auth import get_current_user
+from app.utils.principal_cache import Principal
 
-MAX_ATTEMPTS = 5             
-BLOCK_TIME = 10 * 60        
+MAX_ATTEMPTS = 5
+BLOCK_TIME = 10 * 60
 
+# memory: mỗi worker một bộ đếm riêng; sql: dùng chung bảng rate_limit_hits cho mọi worker
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_MEMORY_SIZE = int(os.getenv("RATE_LIMIT_MEMORY_SIZE", "100000"))
 
-def check_rate_limit(identifier: str):
-    current_time = time.time()
 
-    if identifier not in FAILED_ATTEMPTS:
-        return
+def parse_limit(value: str):
+    count, seconds = value.split("/")
+    return int(count), float(seconds)
 
-    attempts, first_fail_time = FAILED_ATTEMPTS[identifier]
 
-    if attempts >= MAX_ATTEMPTS:
-        if current_time - first_fail_time < BLOCK_TIME:
-            remain = int(BLOCK_TIME - (current_time - first_fail_time))
-            minutes = remain // 60
-            seconds = remain % 60
+# Sliding window log: mỗi khóa giữ thời điểm các lượt gần đây; các hàm trả về số giây phải chờ (0 = được phép)
+class MemoryRateLimitBackend:
+    blocking = False
 
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail=f"Tài khoản bị khóa tạm thời. Vui lòng thử lại sau {minutes} phút {seconds} giây."
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _hits(self, key: str, window: float, now: float):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        hits = entry[0]
+        while hits and hits[0] <= now - window:
+            hits.popleft()
+        return hits
+
+    def _wait(self, hits, limit: int, window: float, now: float):
+        if hits is None or len(hits) < limit:
+            return 0.0
+        return hits[len(hits) - limit] + window - now
+
+    def _record(self, key: str, window: float, now: float):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = (deque(), window)
+        entry[0].append(now)
+        self._entries.move_to_end(key)
+        self._sweep(now)
+
+    # Bỏ các khóa đã hết hạn ở đầu LRU, và khóa cũ nhất khi vượt quá maxsize
+    def _sweep(self, now: float, batch: int = 8):
+        for key in list(islice(self._entries, batch)):
+            hits, window = self._entries[key]
+            if hits and hits[-1] > now - window:
+                break
+            del self._entries[key]
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def retry_after(self, key: str, limit: int, window: float):
+        now = time.time()
+        with self._lock:
+            return self._wait(self._hits(key, window, now), limit, window, now)
+
+    def record(self, key: str, window: float):
+        now = time.time()
+        with self._lock:
+            self._hits(key, window, now)
+            self._record(key, window, now)
+
+    def hit(self, key: str, limit: int, window: float):
+        now = time.time()
+        with self._lock:
+            wait = self._wait(self._hits(key, window, now), limit, window, now)
+            if not wait:
+                self._record(key, window, now)
+            return wait
+
+    def reset(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def purge(self):
+        now = time.time()
+        with self._lock:
+            self._sweep(now, batch=len(self._entries))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "evictions": self.evictions,
+            }
+
+
+class SQLRateLimitBackend:
+    blocking = True
+
+    def _window_stats(self, conn, key: str, window: float, now: float):
+        return conn.execute(
+            select(func.count(), func.min(RateLimitHit.hit_at)).where(
+                RateLimitHit.key == key,
+                RateLimitHit.hit_at > now - window,
             )
-        else:
-            FAILED_ATTEMPTS.pop(identifier)
+        ).one()
 
+    def retry_after(self, key: str, limit: int, window: float):
+        now = time.time()
+        with engine.connect() as conn:
+            count, oldest = self._window_stats(conn, key, window, now)
+        if count < limit:
+            return 0.0
+        return oldest + window - now
 
-def add_failed_attempt(identifier: str):
-    current_time = time.time()
+    def record(self, key: str, window: float):
+        now = time.time()
+        with engine.begin() as conn:
+            conn.execute(insert(RateLimitHit).values(key=key, hit_at=now, expires_at=now + window))
+
+    # PostgreSQL (READ COMMITTED): lượt ghi chưa commit của worker khác không nhìn thấy được, nên khóa
+    # advisory theo khóa rate limit tuần tự hóa các request cùng khóa rồi mới đếm; khóa tự nhả khi transaction kết thúc.
+    # SQLite: câu INSERT giữ khóa ghi của cả database tới khi commit nên ghi trước rồi đếm là đủ, lượt vượt giới hạn bị xóa
+    def hit(self, key: str, limit: int, window: float):
+        now = time.time()
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": key})
+                count, oldest = self._window_stats(conn, key, window, now)
+                if count >= limit:
+                    return oldest + window - now
+                conn.execute(insert(RateLimitHit).values(key=key, hit_at=now, expires_at=now + window))
+                return 0.0
+
+            hit_id = conn.execute(
+                insert(RateLimitHit).values(key=key, hit_at=now, expires_at=now + window)
+            ).inserted_primary_key[0]
+            count, oldest = self._window_stats(conn, key, window, now)
+            if count <= limit:
+                return 0.0
+            conn.execute(delete(RateLimitHit).where(RateLimitHit.id == hit_id))
+        return oldest + window - now
+
+    def reset(self, key: str):
+        with engine.begin() as conn:
+            conn.execute(delete(RateLimitHit).where(RateLimitHit.key == key))
+
+    def purge(self):
+        with engine.begin() as conn:
+            conn.execute(delete(RateLimitHit).where(RateLimitHit.expires_at <= time.time()))
 
-    if identifier not in FAILED_ATTEMPTS:
-        FAILED_ATTEMPTS[identifier] = [1, current_time]
-    else:
-        attempts, first_fail = FAILED_ATTEMPTS[identifier]
-        FAILED_ATTEMPTS[identifier] = [attempts + 1, first_fail]
+    def stats(self):
+        with engine.connect() as conn:
+            size = conn.execute(select(func.count()).select_from(RateLimitHit)).scalar()
+        return {"backend": "sql", "size": size}
+
+
+if RATE_LIMIT_BACKEND == "sql":
+    rate_limit_backend = SQLRateLimitBackend()
+else:
+    rate_limit_backend = MemoryRateLimitBackend(RATE_LIMIT_MEMORY_SIZE)
+
+
+# Từ route async: backend sql truy vấn DB nên chạy trong threadpool
+async def call_rate_limit(fn, *args):
+    if rate_limit_backend.blocking:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+
+# --- Khóa đăng nhập sau nhiều lần sai mật khẩu ---
+def check_rate_limit(identifier: str):
+    remain = rate_limit_backend.retry_after("login:" + identifier, MAX_ATTEMPTS, BLOCK_TIME)
+
+    if remain:
+        remain = math.ceil(remain)
+        minutes = remain // 60
+        seconds = remain % 60
+
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Tài khoản bị khóa tạm thời. Vui lòng thử lại sau {minutes} phút {seconds} giây."
+        )
+
+
+def add_failed_attempt(identifier: str):
+    rate_limit_backend.record("login:" + identifier, BLOCK_TIME)
 
 
 def reset_attempts(identifier: str):
-    if identifier in FAILED_ATTEMPTS:
-        FAILED_ATTEMPTS.pop(identifier)
+    rate_limit_backend.reset("login:" + identifier)
+
+
+# --- Giới hạn tần suất cho các route ghi, theo user đã đăng nhập ---
+class RateLimiter:
+    def __init__(self, scope: str, limit: int, window: float):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def __call__(self, current_user: Principal = Depends(get_current_user)):
+        remain = rate_limit_backend.hit(f"{self.scope}:{current_user.id}", self.limit, self.window)
+        if remain:
+            remain = math.ceil(remain)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Bạn thao tác quá nhanh, vui lòng thử lại sau {remain} giây.",
+                headers={"Retry-After": str(remain)}
+            )
+
+
+post_rate_limit = RateLimiter("post", *parse_limit(os.getenv("RATE_LIMIT_POSTS", "5/60")))
+comment_rate_limit = RateLimiter("comment", *parse_limit(os.getenv("RATE_LIMIT_COMMENTS", "20/60")))
+vote_rate_limit = RateLimiter("vote", *parse_limit(os.getenv("RATE_LIMIT_VOTES", "60/60")))
@@ -0,0 +1,48 @@
+import re
+from typing import List
+from sqlalchemy import Float, Integer, cast, func, literal_column, select, text
+from sqlalchemy.orm import Session
+
+from app.models.models import Post
+
+# Dùng cấu hình "simple" vì PostgreSQL không có bộ tách gốc từ cho tiếng Việt; phải khớp với cột
+# search_vector (PostgreSQL) và bảng posts_fts (SQLite) tạo trong migration 0002_counters_votes_search
+SEARCH_CONFIG = "simple"
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_terms(query: str) -> List[str]:
+    return _TOKEN_RE.findall(query.lower())
+
+
+# Trả về subquery (post_id, rank), rank càng cao càng liên quan; mỗi từ khớp theo tiền tố.
+# Trả về None nếu chuỗi tìm kiếm không có từ nào.
+def search_posts(db: Session, query: str):
+    terms = search_terms(query)
+    if not terms:
+        return None
+
+    if db.get_bind().dialect.name == "postgresql":
+        ts_query = func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{term}:*" for term in terms))
+        vector = literal_column("posts.search_vector")
+        return (
+            # ts_rank trả về real (float4); ép sang double precision để giá trị trong cursor (float của Python)
+            # so sánh đúng bằng với rank khi lọc trang sau, các bài cùng rank không bị lặp hay bỏ sót
+            select(Post.id.label("post_id"), cast(func.ts_rank(vector, ts_query), Float(53)).label("rank"))
+            .where(vector.op("@@")(ts_query))
+            .subquery("search_hits")
+        )
+
+    match = " ".join(f'"{term}"*' for term in terms)
+    return (
+        text(
+            "SELECT rowid AS post_id, -bm25(posts_fts, :title_weight, :content_weight) AS rank "
+            "FROM posts_fts WHERE posts_fts MATCH :match"
+        )
+        .bindparams(match=match, title_weight=TITLE_WEIGHT, content_weight=CONTENT_WEIGHT)
+        .columns(post_id=Integer, rank=Float)
+        .subquery("search_hits")
+    )
@@ -1,12 +1,32 @@
 from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 from jose import jwt
+import asyncio
+import hashlib
+import os
+import threading
+import time
 
 SECRET_KEY = "SUPER_SECRET_KEY"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+
+# Hash có cost thấp hơn BCRYPT_ROUNDS sẽ được băm lại khi user đăng nhập thành công
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
 
 
 def hash_password(password: str):
@@ -17,9 +37,111 @@ def verify_password(plain, hashed):
     return pwd_context.verify(plain, hashed)
 
 
+# Pool riêng cho bcrypt (bcrypt nhả GIL nên dùng thread là đủ), giới hạn số việc đang chờ:
+# khi quá tải trả 503 ngay thay vì để request xếp hàng chiếm worker
+class PasswordHasher:
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+            return self._executor
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Hệ thống đang bận, vui lòng thử lại sau giây lát",
+                    headers={"Retry-After": "1"}
+                )
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
+
+async def hash_password_async(password: str):
+    return await password_hasher.run(pwd_context.hash, password)
+
+
+# Trả về (đúng mật khẩu?, hash mới nếu cần nâng cost)
+async def verify_password_async(plain, hashed):
+    return await password_hasher.run(pwd_context.verify_and_update, plain, hashed)
+
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
 
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+# Ghi nhớ payload của các token đã xác thực, khóa theo SHA-256 của token và hết hạn cùng token
+class TokenCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, payload: dict, expires_at: float):
+        with self._lock:
+            self._entries[key] = (payload, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
+
+def decode_access_token(token: str):
+    key = hashlib.sha256(token.encode()).hexdigest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    # Token không có exp thì không ghi nhớ, để lần sau vẫn được kiểm tra đầy đủ
+    if isinstance(payload.get("exp"), (int, float)):
+        token_cache.put(key, payload, payload["exp"])
+    return payload
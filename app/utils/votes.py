@@ -0,0 +1,66 @@
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.models import Comment, User, Vote
+from app.utils.counters import bump_comment_votes, bump_post_votes
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+# Toggle vote bằng DELETE ... RETURNING rồi INSERT ... ON CONFLICT DO NOTHING.
+# Trả về -1 nếu đã bỏ vote, 1 nếu vừa vote, 0 nếu một request song song đã vote trước.
+def _toggle_vote(db: Session, user_id: int, target, target_id: int):
+    removed = db.execute(
+        delete(Vote)
+        .where(Vote.user_id == user_id, target == target_id)
+        .returning(Vote.id)
+    ).first()
+    if removed:
+        return -1
+
+    insert = _INSERTS[db.get_bind().dialect.name]
+    added = db.execute(
+        insert(Vote)
+        .values({Vote.user_id: user_id, target: target_id})
+        .on_conflict_do_nothing(
+            index_elements=[Vote.user_id, target],
+            index_where=target.isnot(None)
+        )
+        .returning(Vote.id)
+    ).first()
+    return 1 if added else 0
+
+
+def toggle_post_vote(db: Session, user_id: int, post_id: int):
+    delta = _toggle_vote(db, user_id, Vote.post_id, post_id)
+    if delta:
+        bump_post_votes(db, post_id, delta)
+    return delta
+
+
+def toggle_comment_vote(db: Session, user_id: int, comment_id: int):
+    delta = _toggle_vote(db, user_id, Vote.comment_id, comment_id)
+    if delta:
+        bump_comment_votes(db, comment_id, delta)
+    return delta
+
+
+def adjust_reputation(db: Session, user_id: int, delta: int):
+    if not delta or user_id is None:
+        return
+    db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(reputation=func.coalesce(User.reputation, 0) + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Các bài có bình luận của user: huy hiệu theo uy tín của họ hiện trong danh sách bình luận của các bài này
+def commented_post_ids(db: Session, user_id: int):
+    if user_id is None:
+        return []
+    return db.execute(
+        select(Comment.post_id).where(Comment.author_id == user_id, Comment.post_id.is_not(None)).distinct()
+    ).scalars().all()
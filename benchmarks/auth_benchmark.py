@@ -0,0 +1,66 @@
+# Đo chi phí xác thực cho mỗi request: cách cũ (jwt.decode + query User) so với
+# bộ nhớ token đã xác thực + cache principal.
+#
+#   python -m benchmarks.auth_benchmark --iterations 20000
+import argparse
+import time
+
+from benchmarks.common import migrate, use_temp_database
+from benchmarks.dataset import generate
+
+use_temp_database("auth_benchmark.db")
+
+from jose import jwt
+
+from app.database import SessionLocal, engine
+from app.models.models import User
+from app.utils.auth import authenticate
+from app.utils.principal_cache import principal_cache
+from app.utils.security import ALGORITHM, SECRET_KEY, create_access_token, token_cache
+
+
+def legacy_authenticate(db, token):
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    return db.query(User).filter(User.username == payload.get("sub")).first()
+
+
+def per_call_us(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    migrate()
+    with engine.begin() as conn:
+        generate(conn, users=1000, posts=10, comments=10, votes=10)
+
+    token = create_access_token({"sub": "user1", "id": 1})
+    db = SessionLocal()
+    try:
+        def cold():
+            token_cache._entries.clear()
+            principal_cache.clear()
+            authenticate(db, token)
+
+        results = {
+            "legacy (decode + query)": per_call_us(lambda: legacy_authenticate(db, token), args.iterations),
+            "jwt.decode only": per_call_us(lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]), args.iterations),
+            "new, cold caches": per_call_us(cold, args.iterations),
+            "new, warm caches": per_call_us(lambda: authenticate(db, token), args.iterations),
+        }
+    finally:
+        db.close()
+
+    print(f"{'path':<26}{'us/request':>12}")
+    for name, value in results.items():
+        print(f"{name:<26}{value:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import os
+import statistics
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Phải gọi trước khi import app.database: mặc định dùng một file SQLite tạm nếu chưa đặt DATABASE_URL
+def use_temp_database(filename: str):
+    if not os.getenv("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), filename)
+    return os.environ["DATABASE_URL"]
+
+
+def migrate(revision: str = "head"):
+    from alembic import command
+    from alembic.config import Config
+
+    command.upgrade(Config(os.path.join(ROOT, "alembic.ini")), revision)
+
+
+def percentiles(timings):
+    ordered = sorted(timings)
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "p50": statistics.median(ordered),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+    }
+
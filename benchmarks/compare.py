@@ -0,0 +1,97 @@
+# So sánh hai file kết quả của benchmarks.harness (vd. nhánh main và nhánh đang sửa).
+# Báo hồi quy khi p95 hoặc p99 tăng / thông lượng giảm quá --threshold phần trăm, hoặc số câu SQL
+# mỗi request tăng; thoát với mã 1 nếu có hồi quy để dùng được trong CI.
+#
+#   python -m benchmarks.compare bench/main.json bench/head.json --threshold 10
+import argparse
+import json
+import sys
+
+# Chỉ số -> chiều tốt (True: càng cao càng tốt)
+METRICS = {
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "throughput_rps": True,
+    "sql_per_request": False,
+}
+# p50 dao động nhiều giữa các lần chạy nên chỉ hiển thị, không tính là hồi quy
+GATED = ("p95_ms", "p99_ms", "throughput_rps")
+
+
+def load(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def change_percent(old, new):
+    if not old:
+        return None
+    return (new - old) / old * 100
+
+
+def regressions(name, base, head, threshold: float):
+    found = []
+    for metric in GATED:
+        change = change_percent(base.get(metric), head.get(metric))
+        if change is None:
+            continue
+        worse = -change if METRICS[metric] else change
+        if worse > threshold:
+            found.append(f"{name}: {metric} {base[metric]} -> {head[metric]} ({change:+.1f}%)")
+    # Số câu SQL là số đếm chính xác, không có nhiễu: tăng là hồi quy
+    if base.get("sql_per_request") is not None and head.get("sql_per_request") is not None:
+        if head["sql_per_request"] > base["sql_per_request"]:
+            found.append(f"{name}: sql_per_request {base['sql_per_request']} -> {head['sql_per_request']}")
+    if head.get("errors", 0) > base.get("errors", 0):
+        found.append(f"{name}: errors {base.get('errors', 0)} -> {head['errors']}")
+    return found
+
+
+def format_cell(old, new):
+    if old is None or new is None:
+        return "-"
+    change = change_percent(old, new)
+    return f"{old:g} -> {new:g}" + (f" ({change:+.1f}%)" if change is not None else "")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="phần trăm thay đổi được coi là hồi quy")
+    args = parser.parse_args()
+
+    base, head = load(args.base), load(args.head)
+    for label, report in (("base", base), ("head", head)):
+        meta = report["meta"]
+        print(
+            f"{label}: {meta.get('revision')} {meta.get('database')} concurrency={meta.get('concurrency')} "
+            f"requests={meta.get('requests')} dataset={meta.get('dataset', {}).get('posts')} posts"
+        )
+    for key in ("database", "concurrency", "requests", "response_cache"):
+        if base["meta"].get(key) != head["meta"].get(key):
+            print(f"Cảnh báo: {key} khác nhau giữa hai lần chạy ({base['meta'].get(key)} / {head['meta'].get(key)})")
+
+    print(f"{'scenario':<22}" + "".join(f"{metric:>30}" for metric in METRICS))
+    found = []
+    for name, head_result in head["scenarios"].items():
+        base_result = base["scenarios"].get(name)
+        if base_result is None:
+            print(f"{name:<22}(mới)")
+            continue
+        print(f"{name:<22}" + "".join(
+            f"{format_cell(base_result.get(metric), head_result.get(metric)):>30}" for metric in METRICS
+        ))
+        found.extend(regressions(name, base_result, head_result, args.threshold))
+
+    if found:
+        print(f"\nHồi quy (ngưỡng {args.threshold:g}%):")
+        for line in found:
+            print("  " + line)
+        sys.exit(1)
+    print("\nKhông có hồi quy.")
+
+
+if __name__ == "__main__":
+    main()
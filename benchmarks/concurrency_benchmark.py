@@ -0,0 +1,83 @@
+# Đo thông lượng các route đọc chính khi chạy với engine sync (threadpool) và engine async.
+#
+#   DATABASE_URL=postgresql://... python -m benchmarks.concurrency_benchmark --requests 2000 --concurrency 200
+#
+# Mỗi chế độ chạy trong một tiến trình con với DB_ASYNC tương ứng (SQLite async cần cài aiosqlite).
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import migrate, percentiles, use_temp_database
+from benchmarks.dataset import generate
+
+MODES = {"sync": "false", "async": "true"}
+
+
+async def drive(total, concurrency):
+    import httpx
+    from app.database import async_engine
+    from app.main import app
+    from app.utils.security import create_access_token
+
+    headers = {"Authorization": "Bearer " + create_access_token({"sub": "user1", "id": 1})}
+    paths = ["/posts/?limit=20", "/posts/{post_id}", "/comments/{post_id}", "/users/me"]
+    timings = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i):
+            nonlocal errors
+            path = paths[i % len(paths)].format(post_id=1 + i % 100)
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                timings.append((time.perf_counter() - started) * 1000)
+                errors += response.status_code >= 400
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    if async_engine is not None:
+        await async_engine.dispose()
+    return {"throughput": total / elapsed, "errors": errors, **percentiles(timings)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--mode", choices=sorted(MODES))
+    args = parser.parse_args()
+
+    if args.mode:
+        result = asyncio.run(drive(args.requests, args.concurrency))
+        print(json.dumps(result))
+        return
+
+    use_temp_database("concurrency_benchmark.db")
+    migrate()
+    from app.database import engine
+    with engine.begin() as conn:
+        generate(conn, users=500, posts=2000, comments=10000, votes=20000)
+
+    print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for mode, flag in MODES.items():
+        env = dict(os.environ, DB_ASYNC=flag)
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.concurrency_benchmark", "--mode", mode,
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<8}{r['throughput']:>10.1f}{r['p50']:>10.2f}{r['p95']:>10.2f}{r['p99']:>10.2f}{r['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# Sinh dữ liệu forum giả lập theo phân phối lũy thừa: số ít user viết phần lớn bài / bình luận,
+# số ít bài nhận phần lớn bình luận / vote, bình luận trả lời nhau thành các nhánh nhiều tầng.
+#
+#   python -m benchmarks.dataset --users 2000 --posts 10000 --comments 100000 --votes 200000
+import argparse
+import itertools
+import random
+from datetime import datetime, timedelta
+
+from benchmarks.common import migrate, use_temp_database
+
+INSERT_CHUNK = 5000
+MAX_REPLY_DEPTH = 8
+REPLY_RATE = 0.55
+# Xác suất trả lời ngay bình luận mới nhất của bài (tạo các chuỗi hội thoại sâu)
+CHAIN_RATE = 0.35
+COMMENT_VOTE_SHARE = 0.3
+HISTORY_DAYS = 60
+
+
+def power_law_weights(n: int, alpha: float):
+    return list(itertools.accumulate(1 / (rank ** alpha) for rank in range(1, n + 1)))
+
+
+def pick(rng, population, cum_weights, k=1):
+    return rng.choices(population, cum_weights=cum_weights, k=k)
+
+
+def insert_chunks(conn, model, rows):
+    from sqlalchemy import insert
+
+    for start in range(0, len(rows), INSERT_CHUNK):
+        conn.execute(insert(model), rows[start:start + INSERT_CHUNK])
+
+
+def generate(conn, users: int, posts: int, comments: int, votes: int, alpha: float = 1.1, seed: int = 42):
+    from sqlalchemy import inspect
+    from sqlalchemy.orm import Session
+    from app.models.models import Comment, Post, User, Vote
+    from app.utils.counters import reconcile_counters
+    from app.utils.ranking import refresh_hot_scores
+
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    started_at = now - timedelta(days=HISTORY_DAYS)
+
+    user_ids = list(range(1, users + 1))
+    # Thứ hạng hoạt động ngẫu nhiên để user tích cực nhất không luôn là user1
+    active_users = user_ids[:]
+    rng.shuffle(active_users)
+    user_weights = power_law_weights(users, alpha)
+
+    post_rows = []
+    for post_id, author_id in zip(range(1, posts + 1), pick(rng, active_users, user_weights, posts)):
+        created_at = started_at + timedelta(seconds=rng.randint(0, HISTORY_DAYS * 86400))
+        length = min(int(rng.paretovariate(1.5) * 200), 5000)
+        post_rows.append({
+            "id": post_id,
+            "title": f"Bài viết {post_id} của user{author_id}",
+            "content": ("lorem ipsum dolor sit amet " * (length // 27 + 1))[:length],
+            "author_id": author_id,
+            "created_at": created_at,
+            "is_pinned": post_id % 1000 == 0,
+            "comment_count": 0,
+            "vote_count": 0,
+        })
+
+    # Độ "hot" của bài cũng theo phân phối lũy thừa, không phụ thuộc id
+    popular_posts = list(range(1, posts + 1))
+    rng.shuffle(popular_posts)
+    post_weights = power_law_weights(posts, alpha)
+
+    comment_rows = []
+    threads = {}
+    for comment_id in range(1, comments + 1):
+        post_id = pick(rng, popular_posts, post_weights)[0]
+        thread = threads.setdefault(post_id, [])
+        parent = None
+        if thread and rng.random() < REPLY_RATE:
+            parent = thread[-1] if rng.random() < CHAIN_RATE else rng.choice(thread)
+            if parent["depth"] >= MAX_REPLY_DEPTH:
+                parent = None
+        base = parent["created_at"] if parent else post_rows[post_id - 1]["created_at"]
+        created_at = min(base + timedelta(seconds=int(rng.expovariate(1 / 3600)) + 1), now)
+        row = {
+            "id": comment_id,
+            "content": f"Bình luận {comment_id}",
+            "author_id": pick(rng, active_users, user_weights)[0],
+            "post_id": post_id,
+            "parent_id": parent["id"] if parent else None,
+            "created_at": created_at,
+            "is_pinned": False,
+            "is_deleted": rng.random() < 0.01,
+            "vote_count": 0,
+        }
+        comment_rows.append(row)
+        thread.append({"id": comment_id, "depth": parent["depth"] + 1 if parent else 0, "created_at": created_at})
+
+    # Mỗi user chỉ vote một lần cho mỗi bài / bình luận; user tích cực vote nhiều hơn
+    comment_ids = [row["id"] for row in comment_rows]
+    comment_share = COMMENT_VOTE_SHARE if comment_ids else 0
+    comment_weights = power_law_weights(len(comment_ids), alpha) if comment_ids else None
+    capacity = users * (posts + len(comment_ids))
+    pairs = set()
+    while len(pairs) < min(votes, capacity):
+        user_id = pick(rng, active_users, user_weights)[0]
+        if rng.random() < comment_share:
+            pairs.add((user_id, None, pick(rng, comment_ids, comment_weights)[0]))
+        else:
+            pairs.add((user_id, pick(rng, popular_posts, post_weights)[0], None))
+
+    # Uy tín tác giả = số vote nhận được
+    reputation = dict.fromkeys(user_ids, 0)
+    for _, post_id, comment_id in pairs:
+        author_id = post_rows[post_id - 1]["author_id"] if post_id else comment_rows[comment_id - 1]["author_id"]
+        reputation[author_id] += 1
+
+    insert_chunks(conn, User, [
+        {"id": i, "username": f"user{i}", "password": "x", "reputation": reputation[i], "role": "member"}
+        for i in user_ids
+    ])
+    insert_chunks(conn, Post, post_rows)
+    insert_chunks(conn, Comment, comment_rows)
+    insert_chunks(conn, Vote, [
+        {"user_id": u, "post_id": p, "comment_id": c, "vote_type": 1} for u, p, c in pairs
+    ])
+    # Chưa migrate tới 0005_hot_ranking (index_benchmark nạp dữ liệu ở revision cũ) thì migration đó sẽ tự tính điểm hot
+    has_hot_score = "hot_score" in {column["name"] for column in inspect(conn).get_columns("posts")}
+    reconcile_counters(Session(bind=conn), refresh_scores=has_hot_score)
+    if has_hot_score:
+        refresh_hot_scores(conn)
+    # id được chèn thủ công: đưa sequence của PostgreSQL tới id lớn nhất để app vẫn thêm được dữ liệu
+    if conn.dialect.name == "postgresql":
+        for table in ("users", "posts", "comments", "votes"):
+            conn.exec_driver_sql(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT COALESCE(MAX(id), 1) FROM {table}))"
+            )
+
+    depth = max((node["depth"] for thread in threads.values() for node in thread), default=0)
+    return {
+        "users": users,
+        "posts": posts,
+        "comments": comments,
+        "votes": len(pairs),
+        "max_reply_depth": depth,
+        "largest_thread": max((len(thread) for thread in threads.values()), default=0),
+        "hottest_post_id": max(threads, key=lambda post_id: len(threads[post_id])) if threads else 1,
+    }
+
+
+# Nạp dataset vào DB nếu còn trống; DB đã có dữ liệu (vd. PostgreSQL dùng lại giữa các lần chạy)
+# thì giữ nguyên và chỉ trả về thống kê hiện có
+def ensure_dataset(engine, users: int, posts: int, comments: int, votes: int, alpha: float = 1.1, seed: int = 42):
+    from sqlalchemy import func, select
+    from app.models.models import Comment, Post, User, Vote
+
+    with engine.begin() as conn:
+        if conn.execute(select(func.count(User.id))).scalar():
+            hottest = conn.execute(
+                select(Comment.post_id).where(Comment.post_id.is_not(None))
+                .group_by(Comment.post_id).order_by(func.count(Comment.id).desc()).limit(1)
+            ).scalar()
+            return {
+                "reused": True,
+                "users": conn.execute(select(func.count(User.id))).scalar(),
+                "posts": conn.execute(select(func.count(Post.id))).scalar(),
+                "comments": conn.execute(select(func.count(Comment.id))).scalar(),
+                "votes": conn.execute(select(func.count(Vote.id))).scalar(),
+                "hottest_post_id": hottest or 1,
+            }
+        stats = generate(conn, users, posts, comments, votes, alpha, seed)
+    return {"reused": False, **stats}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--comments", type=int, default=100000)
+    parser.add_argument("--votes", type=int, default=200000)
+    parser.add_argument("--alpha", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print("DATABASE_URL =", use_temp_database("forum_dataset.db"))
+    migrate()
+    from app.database import engine
+    stats = ensure_dataset(engine, args.users, args.posts, args.comments, args.votes, args.alpha, args.seed)
+    for name, value in stats.items():
+        print(f"{name:<18}{value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# Chạy các route đọc thật của app ngay trong tiến trình (httpx + ASGITransport) trên dataset của
+# benchmarks.dataset: ghi p50/p95/p99, thông lượng, số câu SQL và thời gian DB mỗi request (đọc từ
+# header Server-Timing), rồi lưu JSON để so sánh giữa các commit bằng benchmarks.compare.
+#
+#   python -m benchmarks.harness --requests 300 --concurrency 10 --output bench/head.json
+#   DATABASE_URL=postgresql://... python -m benchmarks.harness --output bench/head-pg.json
+#
+# Mặc định tắt cache response để đo đường đi thật tới DB; thêm --response-cache để đo cả cache.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.common import ROOT, migrate, percentiles, use_temp_database
+
+SERVER_TIMING = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+# Tên kịch bản -> (đường dẫn, có đăng nhập không). {post_id}: bài ngẫu nhiên, {hot_post_id}: bài nhiều bình luận nhất
+SCENARIOS = {
+    "feed_hot": ("/posts/?limit=20&cursor=", False),
+    "feed_hot_user": ("/posts/?limit=20&cursor=", True),
+    "feed_new_offset": ("/posts/?limit=20&sort=new&skip=200", False),
+    "feed_top_preview": ("/posts/?limit=20&sort=top&preview=true&cursor=", False),
+    "feed_search": ("/posts/?limit=20&search=lorem", False),
+    "post_detail": ("/posts/{post_id}", False),
+    "comments_tree": ("/comments/{post_id}", False),
+    "comments_tree_hot": ("/comments/{hot_post_id}", True),
+    "comments_page_hot": ("/comments/{hot_post_id}?cursor=&limit=20", True),
+    "comments_stream_hot": ("/comments/{hot_post_id}/stream", False),
+    "users_me": ("/users/me", True),
+}
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain"], cwd=ROOT, capture_output=True, text=True).stdout
+        return revision + ("-dirty" if dirty.strip() else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_scenario(client, path, headers, total, warmup, concurrency, post_ids, hot_post_id):
+    rng = random.Random(7)
+    semaphore = asyncio.Semaphore(concurrency)
+    timings, queries, db_ms = [], [], []
+    errors = 0
+
+    def url():
+        return path.format(post_id=rng.choice(post_ids), hot_post_id=hot_post_id)
+
+    async def one(record):
+        nonlocal errors
+        target = url()
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(target, headers=headers)
+            elapsed = (time.perf_counter() - started) * 1000
+        if not record:
+            return
+        timings.append(elapsed)
+        errors += response.status_code >= 400
+        match = SERVER_TIMING.search(response.headers.get("server-timing", ""))
+        if match:
+            db_ms.append(float(match.group(1)))
+            queries.append(int(match.group(2)))
+
+    await asyncio.gather(*(one(False) for _ in range(warmup)))
+    started = time.perf_counter()
+    await asyncio.gather(*(one(True) for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    latency = percentiles(timings)
+    return {
+        "requests": total,
+        "errors": errors,
+        "p50_ms": round(latency["p50"], 3),
+        "p95_ms": round(latency["p95"], 3),
+        "p99_ms": round(latency["p99"], 3),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "throughput_rps": round(total / elapsed, 1),
+        "sql_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        "db_ms_per_request": round(sum(db_ms) / len(db_ms), 3) if db_ms else None,
+    }
+
+
+async def drive(args, dataset):
+    import httpx
+    from app.database import async_engine
+    from app.main import app
+    from app.utils.security import create_access_token
+
+    auth = {"Authorization": "Bearer " + create_access_token({"sub": "user1", "id": 1})}
+    post_ids = list(range(1, dataset["posts"] + 1))
+    names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in names:
+            path, logged_in = SCENARIOS[name]
+            results[name] = await run_scenario(
+                client, path, auth if logged_in else {}, args.requests, args.warmup,
+                args.concurrency, post_ids, dataset["hottest_post_id"]
+            )
+            r = results[name]
+            print(
+                f"{name:<22}{r['throughput_rps']:>9.1f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+                f"{r['sql_per_request'] if r['sql_per_request'] is not None else '-':>8}{r['errors']:>8}"
+            )
+
+    if async_engine is not None:
+        await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--votes", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenarios", help="danh sách kịch bản, cách nhau bởi dấu phẩy: " + ",".join(SCENARIOS))
+    parser.add_argument("--response-cache", action="store_true")
+    parser.add_argument("--output", help="ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    if args.scenarios:
+        unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+        if unknown:
+            parser.error("kịch bản không tồn tại: " + ", ".join(sorted(unknown)))
+
+    # Phải đặt trước khi import app
+    use_temp_database("harness.db")
+    if not args.response_cache:
+        os.environ["RESPONSE_CACHE_TTL"] = "0"
+    os.environ["SERVER_TIMING"] = "true"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("SLOW_QUERY_MS", "60000")
+
+    migrate()
+    from app.database import engine
+    from benchmarks.dataset import ensure_dataset
+
+    started = time.perf_counter()
+    dataset = ensure_dataset(engine, args.users, args.posts, args.comments, args.votes)
+    print(f"dataset ({'dùng lại' if dataset['reused'] else 'mới'}, {time.perf_counter() - started:.1f}s): {dataset}")
+
+    print(f"{'scenario':<22}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'sql':>8}{'errors':>8}")
+    results = asyncio.run(drive(args, dataset))
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "database": engine.dialect.name,
+            "database_url": engine.url.render_as_string(hide_password=True),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "response_cache": args.response_cache,
+            "dataset": dataset,
+        },
+        "scenarios": results,
+    }
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print("Đã lưu kết quả vào", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# So sánh query plan và độ trễ của các truy vấn chính trước và sau migration chỉ mục phụ.
+#
+#   python -m benchmarks.index_benchmark --posts 20000 --comments 100000 --votes 200000
+#
+# Mặc định dùng một file SQLite tạm; đặt DATABASE_URL để chạy trên một database PostgreSQL trống.
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import use_temp_database, migrate
+from benchmarks.dataset import generate
+
+use_temp_database("index_benchmark.db")
+
+from sqlalchemy import text
+
+from app.database import engine
+
+BEFORE = "0002_counters_votes_search"
+AFTER = "head"
+
+QUERIES = {
+    "comment thread": (
+        "SELECT id FROM comments WHERE post_id = :post_id "
+        "ORDER BY is_pinned DESC, vote_count DESC, created_at DESC"
+    ),
+    "replies of comment": "SELECT id FROM comments WHERE parent_id = :comment_id",
+    "pinned posts": "SELECT id FROM posts WHERE is_pinned = true ORDER BY created_at DESC",
+    "votes of post": "SELECT count(*) FROM votes WHERE post_id = :post_id",
+    "votes by user": "SELECT count(*) FROM votes WHERE user_id = :user_id",
+    "decay candidates": (
+        "SELECT count(*) FROM users WHERE reputation > 0 "
+        "AND EXISTS (SELECT 1 FROM posts WHERE posts.author_id = users.id) "
+        "AND NOT EXISTS (SELECT 1 FROM posts WHERE posts.author_id = users.id AND posts.created_at > :cutoff)"
+    ),
+}
+
+
+def explain(conn, sql, params):
+    if conn.dialect.name == "postgresql":
+        rows = conn.execute(text("EXPLAIN (ANALYZE, BUFFERS) " + sql), params)
+        return "\n".join(row[0] for row in rows)
+    rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params)
+    return "\n".join(row[-1] for row in rows)
+
+
+def measure(conn, repeat, params):
+    results = {}
+    for name, sql in QUERIES.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(text(sql), params).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = (statistics.median(timings), explain(conn, sql, params))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--votes", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    migrate(BEFORE)
+    with engine.begin() as conn:
+        generate(conn, args.users, args.posts, args.comments, args.votes)
+
+    params = {
+        "post_id": args.posts // 2,
+        "comment_id": args.comments // 2,
+        "user_id": args.users // 2,
+        "cutoff": datetime.utcnow() - timedelta(days=7),
+    }
+    with engine.connect() as conn:
+        before = measure(conn, args.repeat, params)
+    migrate(AFTER)
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.exec_driver_sql("ANALYZE")
+        after = measure(conn, args.repeat, params)
+
+    print(f"{'query':<22}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in QUERIES:
+        b, a = before[name][0], after[name][0]
+        print(f"{name:<22}{b:>12.3f}{a:>12.3f}{b / a if a else 0:>9.1f}x")
+    for name in QUERIES:
+        print(f"\n== {name}\n-- before\n{before[name][1]}\n-- after\n{after[name][1]}")
+
+
+if __name__ == "__main__":
+    main()
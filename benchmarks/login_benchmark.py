@@ -0,0 +1,91 @@
+# Đo độ trễ của feed khi có nhiều request đăng nhập cùng lúc (bcrypt chạy trong pool riêng,
+# không chặn event loop).
+#
+#   BCRYPT_ROUNDS=12 python -m benchmarks.login_benchmark --feed-requests 500 --logins 200
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import migrate, percentiles, use_temp_database
+from benchmarks.dataset import generate
+
+use_temp_database("login_benchmark.db")
+
+import httpx
+from sqlalchemy import update
+
+from app.database import async_engine, engine
+from app.main import app
+from app.models.models import User
+from app.utils.security import hash_password, password_hasher
+
+
+async def feed_load(client, total, concurrency):
+    timings = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await client.get("/posts/?limit=20")
+            timings.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return timings
+
+
+async def login_storm(client, total, users):
+    statuses = []
+
+    async def one(i):
+        response = await client.post(
+            "/auth/login", data={"username": f"user{1 + i % users}", "password": "benchmark"}
+        )
+        statuses.append(response.status_code)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return statuses, time.perf_counter() - started
+
+
+async def run(args):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        baseline = await feed_load(client, args.feed_requests, args.concurrency)
+
+        storm = asyncio.create_task(login_storm(client, args.logins, args.users))
+        under_storm = await feed_load(client, args.feed_requests, args.concurrency)
+        statuses, storm_seconds = await storm
+
+    password_hasher.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+    return baseline, under_storm, statuses, storm_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--feed-requests", type=int, default=300)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=200)
+    args = parser.parse_args()
+
+    migrate()
+    with engine.begin() as conn:
+        generate(conn, users=args.users, posts=2000, comments=5000, votes=5000)
+        conn.execute(update(User).values(password=hash_password("benchmark")))
+
+    baseline, under_storm, statuses, storm_seconds = asyncio.run(run(args))
+
+    print(f"{'feed':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, timings in (("no logins", baseline), ("login storm", under_storm)):
+        p = percentiles(timings)
+        print(f"{name:<16}{p['p50']:>10.2f}{p['p95']:>10.2f}{p['p99']:>10.2f}")
+    ok = sum(code == 200 for code in statuses)
+    print(f"logins: {ok}/{len(statuses)} ok, {len(statuses) - ok} rejected/failed, "
+          f"{len(statuses) / storm_seconds:.1f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Đo chi phí chuyển một trang feed 100 bài sang JSON: cách cũ (jsonable_encoder + json.dumps của
+# JSONResponse) so với response_model (pydantic-core) + ORJSONResponse.
+#
+#   python -m benchmarks.serialization_benchmark --iterations 2000
+import argparse
+import time
+from typing import List
+
+from benchmarks.common import migrate, use_temp_database
+from benchmarks.dataset import generate
+
+use_temp_database("serialization_benchmark.db")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+from app.database import SessionLocal, engine
+from app.routers.posts import load_feed
+from app.schemas import PostItem
+
+
+def per_call_us(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    migrate()
+    with engine.begin() as conn:
+        generate(conn, users=200, posts=2000, comments=2000, votes=2000)
+
+    db = SessionLocal()
+    try:
+        feed = load_feed(db, 0, args.limit, None, None, "hot", 1)
+    finally:
+        db.close()
+
+    adapter = TypeAdapter(List[PostItem])
+
+    # Giống FastAPI khi route có response_model: validate (from_attributes) rồi serialize mode="json"
+    def new_path():
+        value = adapter.validate_python(feed, from_attributes=True)
+        return ORJSONResponse(adapter.dump_python(value, mode="json")).body
+
+    def legacy_path():
+        return JSONResponse(jsonable_encoder(feed)).body
+
+    results = {
+        "jsonable_encoder + json": per_call_us(legacy_path, args.iterations),
+        "response_model + orjson": per_call_us(new_path, args.iterations),
+    }
+
+    print(f"{len(feed)} posts, {len(new_path())} bytes")
+    print(f"{'path':<26}{'us/response':>12}")
+    for name, value in results.items():
+        print(f"{name:<26}{value:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
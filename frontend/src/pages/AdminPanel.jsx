@@ -6,6 +6,7 @@ const AdminPanel = () => {
     const [users, setUsers] = useState([]);
     const [searchTerm, setSearchTerm] = useState('');
     const [loading, setLoading] = useState(true);
+    const [selectedIds, setSelectedIds] = useState([]);
     const navigate = useNavigate();
 
     useEffect(() => {
@@ -62,6 +63,28 @@ const AdminPanel = () => {
         }
     };
 
+    const toggleSelect = (userId) => {
+        setSelectedIds(selectedIds.includes(userId)
+            ? selectedIds.filter(id => id !== userId)
+            : [...selectedIds, userId]);
+    };
+
+    const handleBulk = async (path, confirmMsg) => {
+        if (selectedIds.length === 0) return;
+        if (!window.confirm(`${confirmMsg} (${selectedIds.length} thành viên)?`)) return;
+
+        try {
+            const res = await api.post(path, { user_ids: selectedIds });
+            setSelectedIds([]);
+            fetchUsers();
+            if (res.data.deleted !== undefined) {
+                alert(`Đã xóa ${res.data.deleted} bình luận`);
+            }
+        } catch (error) {
+            alert("Lỗi khi thao tác hàng loạt: " + error.response?.data?.detail);
+        }
+    };
+
 const filteredUsers = users.filter(user => {
         const searchRaw = searchTerm.toLowerCase().trim(); 
         const searchNoAccent = removeAccents(searchTerm); 
@@ -111,10 +134,30 @@ const filteredUsers = users.filter(user => {
                 />
             </div>
 
+            <div style={{ display: 'flex', gap: '10px', alignItems: 'center', marginBottom: '15px' }}>
+                <span>Đã chọn {selectedIds.length}</span>
+                <button disabled={selectedIds.length === 0} onClick={() => handleBulk('/admin/users/ban', 'Ban các thành viên đã chọn')} style={{ padding: '6px 12px', cursor: 'pointer' }}>
+                    Ban
+                </button>
+                <button disabled={selectedIds.length === 0} onClick={() => handleBulk('/admin/users/unban', 'Mở khóa các thành viên đã chọn')} style={{ padding: '6px 12px', cursor: 'pointer' }}>
+                    Mở khóa
+                </button>
+                <button disabled={selectedIds.length === 0} onClick={() => handleBulk('/admin/comments/delete-by-user', 'Xóa toàn bộ bình luận của các thành viên đã chọn')} style={{ padding: '6px 12px', cursor: 'pointer' }}>
+                    Xóa bình luận
+                </button>
+            </div>
+
             <div style={{ overflowX: 'auto', boxShadow: '0 4px 12px rgba(0,0,0,0.1)', borderRadius: '8px' }}>
                 <table style={{ width: '100%', borderCollapse: 'collapse', background: 'white' }}>
                     <thead style={{ background: '#f4f4f4', borderBottom: '2px solid #ddd' }}>
                         <tr>
+                            <th style={thStyle}>
+                                <input
+                                    type="checkbox"
+                                    checked={filteredUsers.length > 0 && filteredUsers.every(u => selectedIds.includes(u.id))}
+                                    onChange={(e) => setSelectedIds(e.target.checked ? filteredUsers.map(u => u.id) : [])}
+                                />
+                            </th>
                             <th style={thStyle}>ID</th>
                             <th style={thStyle}>Thành viên</th>
                             <th style={thStyle}>Điểm uy tín</th>
@@ -126,6 +169,9 @@ const filteredUsers = users.filter(user => {
                     <tbody>
                         {filteredUsers.map(user => (
                             <tr key={user.id} style={{ borderBottom: '1px solid #eee' }}>
+                                <td style={tdStyle}>
+                                    <input type="checkbox" checked={selectedIds.includes(user.id)} onChange={() => toggleSelect(user.id)} />
+                                </td>
                                 <td style={tdStyle}>#{user.id}</td>
                                 <td style={tdStyle}>
                                     <strong>{user.display_name || user.username}</strong><br/>
@@ -705,25 +705,6 @@ function Home() {
         return sorted;
     }
 
-    const buildCommentTree = (comments) => {
-        const map = {};
-        const roots = [];
-        
-        comments.forEach(c => {
-            map[c.id] = { ...c, children: [] };
-        });
-
-        comments.forEach(c => {
-            if (c.parent_id && map[c.parent_id]) {
-                map[c.parent_id].children.push(map[c.id]);
-            } else {
-                roots.push(map[c.id]);
-            }
-        });
-    
-        return sortComments(roots); 
-    };
-
     const openCommentModal = async (post) => {
         setCurrentPostForComment(post);
         setShowCommentModal(true);
@@ -731,8 +712,7 @@ function Home() {
         
         try {
             const response = await api.get(`/comments/${post.id}`);
-            const tree = buildCommentTree(response.data);
-            setCommentsTree(tree);
+            setCommentsTree(response.data);
         } catch (error) {
             console.error("Lỗi tải comment:", error);
         }
@@ -756,7 +736,7 @@ function Home() {
             setReplyingTo(null); 
             
             const response = await api.get(`/comments/${currentPostForComment.id}`);
-            setCommentsTree(buildCommentTree(response.data));
+            setCommentsTree(response.data);
             
             setPosts(prevPosts => prevPosts.map(post => {
                 if (post.id === currentPostForComment.id) {
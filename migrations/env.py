@@ -0,0 +1,51 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.database import Base, engine
+from app.models import models  # noqa: F401  (đăng ký các bảng vào Base.metadata)
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Cột tsvector và bảng FTS5 do app.utils.search quản lý, không có trong model
+SEARCH_OBJECTS = {"search_vector", "ix_posts_search_vector", "posts_fts"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if name in SEARCH_OBJECTS or (name or "").startswith("posts_fts_"):
+        return False
+    return True
+
+
+def run_migrations_offline():
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
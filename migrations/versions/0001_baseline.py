@@ -0,0 +1,74 @@
+"""baseline schema
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+Database tạo trước đây bằng Base.metadata.create_all đã có sẵn các bảng này,
+hãy chạy `alembic stamp 0001_baseline` rồi `alembic upgrade head`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(length=100), nullable=False, unique=True),
+        sa.Column("password", sa.String(length=200), nullable=False),
+        sa.Column("reputation", sa.Integer(), nullable=True),
+        sa.Column("is_banned", sa.Boolean(), nullable=True),
+        sa.Column("role", sa.String(length=50), nullable=True),
+        sa.Column("email", sa.String(), nullable=True, unique=True),
+        sa.Column("display_name", sa.String(), nullable=True),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+
+    op.create_table(
+        "posts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(length=300), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("author_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("is_pinned", sa.Boolean(), nullable=True),
+        sa.Column("comment_count", sa.Integer(), nullable=True),
+    )
+    op.create_index("ix_posts_id", "posts", ["id"])
+
+    op.create_table(
+        "comments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("author_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("post_id", sa.Integer(), sa.ForeignKey("posts.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("parent_id", sa.Integer(), sa.ForeignKey("comments.id"), nullable=True),
+        sa.Column("is_pinned", sa.Boolean(), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+    )
+    op.create_index("ix_comments_id", "comments", ["id"])
+
+    op.create_table(
+        "votes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("vote_type", sa.Integer(), nullable=True),
+        sa.Column("post_id", sa.Integer(), sa.ForeignKey("posts.id"), nullable=True),
+        sa.Column("comment_id", sa.Integer(), sa.ForeignKey("comments.id"), nullable=True),
+    )
+    op.create_index("ix_votes_id", "votes", ["id"])
+
+
+def downgrade():
+    op.drop_table("votes")
+    op.drop_table("comments")
+    op.drop_table("posts")
+    op.drop_table("users")
@@ -0,0 +1,123 @@
+"""vote counters, unique votes, feed order index and full-text search
+
+Revision ID: 0002_counters_votes_search
+Revises: 0001_baseline
+Create Date: 2026-10-18 00:00:01
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002_counters_votes_search"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+# DDL tìm kiếm toàn văn được chép nguyên vào revision này (không import từ app) để revision không đổi theo code.
+# PostgreSQL: cột tsvector sinh tự động + GIN, cấu hình "simple" vì không có bộ tách gốc từ cho tiếng Việt
+POSTGRES_SEARCH_DDL = [
+    """
+    ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(content, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING GIN (search_vector)",
+]
+
+# SQLite: bảng FTS5 dùng "external content" trỏ tới posts, trigger giữ chỉ mục đồng bộ khi thêm/sửa/xóa
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+        title, content, content='posts', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 0'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF title, content ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    "INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade():
+    op.add_column("posts", sa.Column("vote_count", sa.Integer(), nullable=True))
+    op.add_column("comments", sa.Column("vote_count", sa.Integer(), nullable=True))
+
+    # Xóa vote trùng (giữ vote cũ nhất) trước khi tạo unique index
+    for target in ("post_id", "comment_id"):
+        op.execute(
+            f"DELETE FROM votes WHERE {target} IS NOT NULL AND id NOT IN ("
+            f"SELECT min(id) FROM votes WHERE {target} IS NOT NULL GROUP BY user_id, {target})"
+        )
+        op.create_index(
+            f"uq_votes_user_{target[:-3]}",
+            "votes",
+            ["user_id", target],
+            unique=True,
+            postgresql_where=sa.text(f"{target} IS NOT NULL"),
+            sqlite_where=sa.text(f"{target} IS NOT NULL"),
+        )
+
+    op.execute(
+        "UPDATE posts SET vote_count = (SELECT count(*) FROM votes WHERE votes.post_id = posts.id)"
+    )
+    op.execute(
+        "UPDATE comments SET vote_count = (SELECT count(*) FROM votes WHERE votes.comment_id = comments.id)"
+    )
+    op.execute(
+        "UPDATE posts SET comment_count = (SELECT count(*) FROM comments "
+        "WHERE comments.post_id = posts.id AND (comments.is_deleted IS NULL OR comments.is_deleted = false))"
+    )
+
+    op.create_index(
+        "ix_posts_feed_order",
+        "posts",
+        [
+            sa.text("is_pinned"),
+            sa.text("date(created_at) DESC"),
+            sa.text("created_at DESC"),
+            sa.text("id DESC"),
+        ],
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        for statement in POSTGRES_SEARCH_DDL:
+            bind.exec_driver_sql(statement)
+    elif bind.dialect.name == "sqlite":
+        for statement in SQLITE_SEARCH_DDL:
+            bind.exec_driver_sql(statement)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_posts_search_vector")
+        op.execute("ALTER TABLE posts DROP COLUMN IF EXISTS search_vector")
+    elif bind.dialect.name == "sqlite":
+        for trigger in ("posts_fts_ai", "posts_fts_ad", "posts_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS posts_fts")
+
+    op.drop_index("ix_posts_feed_order", table_name="posts")
+    op.drop_index("uq_votes_user_comment", table_name="votes")
+    op.drop_index("uq_votes_user_post", table_name="votes")
+    with op.batch_alter_table("comments") as batch_op:
+        batch_op.drop_column("vote_count")
+    with op.batch_alter_table("posts") as batch_op:
+        batch_op.drop_column("vote_count")
@@ -0,0 +1,38 @@
+"""secondary indexes for feed, comment, vote and decay access paths
+
+Revision ID: 0003_secondary_indexes
+Revises: 0002_counters_votes_search
+Create Date: 2026-10-18 00:00:02
+"""
+from alembic import op
+
+
+revision = "0003_secondary_indexes"
+down_revision = "0002_counters_votes_search"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    # bài ghim sắp theo thời gian
+    ("ix_posts_pinned_created", "posts", ["is_pinned", "created_at"]),
+    # job trừ điểm uy tín: bài mới nhất của mỗi tác giả
+    ("ix_posts_author_created", "posts", ["author_id", "created_at"]),
+    # tải bình luận của một bài viết
+    ("ix_comments_post_created", "comments", ["post_id", "created_at"]),
+    ("ix_comments_parent_id", "comments", ["parent_id"]),
+    ("ix_comments_author_id", "comments", ["author_id"]),
+    # đếm / đối soát vote theo bài viết, bình luận và theo user
+    ("ix_votes_post_user", "votes", ["post_id", "user_id"]),
+    ("ix_votes_comment_user", "votes", ["comment_id", "user_id"]),
+    ("ix_votes_user_id", "votes", ["user_id"]),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,32 @@
+"""shared rate limiter table
+
+Revision ID: 0004_rate_limit_hits
+Revises: 0003_secondary_indexes
+Create Date: 2026-10-18 00:00:03
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004_rate_limit_hits"
+down_revision = "0003_secondary_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "rate_limit_hits",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("key", sa.String(length=200), nullable=False),
+        sa.Column("hit_at", sa.Float(), nullable=False),
+        sa.Column("expires_at", sa.Float(), nullable=False),
+    )
+    op.create_index("ix_rate_limit_hits_key_hit_at", "rate_limit_hits", ["key", "hit_at"])
+    op.create_index("ix_rate_limit_hits_expires_at", "rate_limit_hits", ["expires_at"])
+
+
+def downgrade():
+    op.drop_index("ix_rate_limit_hits_expires_at", table_name="rate_limit_hits")
+    op.drop_index("ix_rate_limit_hits_key_hit_at", table_name="rate_limit_hits")
+    op.drop_table("rate_limit_hits")
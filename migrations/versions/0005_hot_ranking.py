@@ -0,0 +1,119 @@
+"""precomputed hot score and per-sort feed indexes
+
+Revision ID: 0005_hot_ranking
+Revises: 0004_rate_limit_hits
+Create Date: 2026-10-18 00:00:04
+"""
+import math
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005_hot_ranking"
+down_revision = "0004_rate_limit_hits"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_posts_hot_order", ["is_pinned", "hot_score", "id"]),
+    ("ix_posts_new_order", ["is_pinned", "created_at", "id"]),
+    ("ix_posts_top_order", ["is_pinned", "vote_count", "id"]),
+]
+
+# Bản sao cố định công thức app.utils.ranking.hot_score tại thời điểm revision này (không import từ app để
+# revision không đổi theo code); job định kỳ của app tính lại điểm theo công thức hiện hành
+HOT_EPOCH = datetime(2024, 1, 1)
+HOT_DECAY_SECONDS = 45000.0
+COMMENT_WEIGHT = 2
+REPUTATION_WEIGHT = 0.5
+ADMIN_BOOST = 1.0
+BACKFILL_CHUNK = 1000
+
+posts = sa.table(
+    "posts",
+    sa.column("id", sa.Integer),
+    sa.column("author_id", sa.Integer),
+    sa.column("created_at", sa.DateTime),
+    sa.column("vote_count", sa.Integer),
+    sa.column("comment_count", sa.Integer),
+    sa.column("hot_score", sa.Float),
+)
+users = sa.table(
+    "users",
+    sa.column("id", sa.Integer),
+    sa.column("reputation", sa.Integer),
+    sa.column("role", sa.String),
+)
+
+
+def hot_score(vote_count, comment_count, created_at, author_reputation, author_is_admin):
+    engagement = max(vote_count or 0, 0) + COMMENT_WEIGHT * max(comment_count or 0, 0)
+    score = math.log10(max(engagement, 1))
+    score += REPUTATION_WEIGHT * math.log10(1 + max(author_reputation or 0, 0))
+    if author_is_admin:
+        score += ADMIN_BOOST
+    age = ((created_at or HOT_EPOCH) - HOT_EPOCH).total_seconds()
+    return round(score + age / HOT_DECAY_SECONDS, 7)
+
+
+def backfill_hot_scores(bind):
+    query = (
+        sa.select(
+            posts.c.id,
+            posts.c.vote_count,
+            posts.c.comment_count,
+            posts.c.created_at,
+            users.c.reputation,
+            users.c.role,
+        )
+        .select_from(posts.outerjoin(users, users.c.id == posts.c.author_id))
+        .order_by(posts.c.id)
+        .limit(BACKFILL_CHUNK)
+    )
+    write = posts.update().where(posts.c.id == sa.bindparam("post_id")).values(hot_score=sa.bindparam("score"))
+
+    last_id = 0
+    while True:
+        rows = bind.execute(query.where(posts.c.id > last_id)).all()
+        if not rows:
+            break
+        bind.execute(write, [
+            {
+                "post_id": row.id,
+                "score": hot_score(row.vote_count, row.comment_count, row.created_at, row.reputation, row.role == "admin"),
+            }
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+
+def upgrade():
+    op.add_column("posts", sa.Column("hot_score", sa.Float(), nullable=False, server_default="0"))
+
+    # Thứ tự feed cũ (ngày, admin, uy tín, thời gian) được thay bằng các chế độ sort mới
+    op.drop_index("ix_posts_feed_order", table_name="posts")
+    op.drop_index("ix_posts_pinned_created", table_name="posts")
+    for name, columns in INDEXES:
+        op.create_index(name, "posts", columns)
+
+    backfill_hot_scores(op.get_bind())
+
+
+def downgrade():
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name="posts")
+    op.create_index("ix_posts_pinned_created", "posts", ["is_pinned", "created_at"])
+    op.create_index(
+        "ix_posts_feed_order",
+        "posts",
+        [
+            sa.text("is_pinned"),
+            sa.text("date(created_at) DESC"),
+            sa.text("created_at DESC"),
+            sa.text("id DESC"),
+        ],
+    )
+    # ALTER TABLE ... DROP COLUMN trực tiếp (SQLite >= 3.35) để giữ các trigger FTS trên posts
+    op.drop_column("posts", "hot_score")
@@ -0,0 +1,28 @@
+"""index for paginated comment threads
+
+Revision ID: 0006_comment_thread_index
+Revises: 0005_hot_ranking
+Create Date: 2026-10-18 00:00:05
+"""
+from alembic import op
+
+
+revision = "0006_comment_thread_index"
+down_revision = "0005_hot_ranking"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Cursor so sánh theo bộ (is_pinned, vote_count, created_at, id): không để NULL lọt vào khóa
+    op.execute("UPDATE comments SET is_pinned = false WHERE is_pinned IS NULL")
+    op.execute("UPDATE comments SET vote_count = 0 WHERE vote_count IS NULL")
+    op.create_index(
+        "ix_comments_thread_order",
+        "comments",
+        ["post_id", "parent_id", "is_pinned", "vote_count", "created_at", "id"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_comments_thread_order", table_name="comments")
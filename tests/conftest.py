@@ -0,0 +1,37 @@
+import os
+import tempfile
+
+# Phải đặt trước khi import app: mặc định chạy trên một file SQLite tạm, đặt TEST_DATABASE_URL để chạy trên PostgreSQL
+# (database đó sẽ bị xóa sạch dữ liệu sau mỗi test)
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import delete
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def engine():
+    command.upgrade(Config(os.path.join(ROOT, "alembic.ini")), "head")
+    from app.database import engine
+    yield engine
+    engine.dispose()
+
+
+# Mỗi test tự tạo dữ liệu của mình; xóa hết sau khi test xong (bảng con trước bảng cha)
+@pytest.fixture(autouse=True)
+def clean_database(engine):
+    yield
+    from app.models.models import Base
+    from app.utils.principal_cache import principal_cache
+    from app.utils.cache import invalidate_all
+
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(delete(table))
+    principal_cache.clear()
+    invalidate_all()
@@ -0,0 +1,83 @@
+import threading
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, insert, select
+
+from app.main import app
+from app.models.models import Comment, Post, User
+from app.utils.security import create_access_token
+
+AUTHOR_ID = 1
+COMMENTERS = 10
+THREADS_PER_COMMENTER = 2
+# Dưới giới hạn RATE_LIMIT_COMMENTS mặc định (20/60) cho mỗi user
+ROUNDS = 3
+
+
+def auth_headers(user_id: int):
+    return {"Authorization": "Bearer " + create_access_token({"sub": f"user{user_id}", "id": user_id})}
+
+
+@pytest.fixture
+def post(engine):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "password": "x", "reputation": 0, "role": "member"}
+            for i in range(1, COMMENTERS + 2)
+        ])
+        conn.execute(insert(Post).values(
+            id=1, title="post", content="content", author_id=AUTHOR_ID, created_at=now, comment_count=4, vote_count=0
+        ))
+        conn.execute(insert(Comment), [
+            {"id": i, "content": "comment", "author_id": AUTHOR_ID, "post_id": 1, "created_at": now, "vote_count": 0}
+            for i in range(1, 5)
+        ])
+    return engine
+
+
+def comment_count(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(Post.comment_count).where(Post.id == 1)).scalar()
+
+
+def test_deleting_a_comment_twice_decrements_once(post):
+    client = TestClient(app)
+    headers = auth_headers(AUTHOR_ID)
+
+    assert client.delete("/comments/1", headers=headers).status_code == 200
+    assert client.delete("/comments/1", headers=headers).status_code == 200
+    assert comment_count(post) == 3
+
+
+# SQLite tuần tự hóa mọi giao dịch ghi; chạy với TEST_DATABASE_URL trỏ tới PostgreSQL để kiểm tra lost update
+def test_concurrent_comment_creation_keeps_comment_count(post):
+    client = TestClient(app, raise_server_exceptions=False)
+    workers = [user_id for user_id in range(AUTHOR_ID + 1, COMMENTERS + 2) for _ in range(THREADS_PER_COMMENTER)]
+    barrier = threading.Barrier(len(workers))
+    statuses = []
+    lock = threading.Lock()
+
+    def comment(user_id):
+        headers = auth_headers(user_id)
+        barrier.wait()
+        for _ in range(ROUNDS):
+            status = client.post("/comments/create/1", json={"content": "reply"}, headers=headers).status_code
+            with lock:
+                statuses.append(status)
+
+    threads = [threading.Thread(target=comment, args=(user_id,)) for user_id in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert statuses == [200] * len(workers) * ROUNDS
+    with post.connect() as conn:
+        live = conn.execute(
+            select(func.count(Comment.id)).where(Comment.post_id == 1, Comment.is_deleted.is_not(True))
+        ).scalar()
+    assert live == 4 + len(workers) * ROUNDS
+    assert comment_count(post) == live
@@ -0,0 +1,55 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import events
+from app.utils.events import broker, post_channel
+
+
+# Lệnh được xử lý lần lượt: khi nhận được lỗi của lệnh sai thì các lệnh gửi trước nó đã có hiệu lực
+def sync(ws):
+    ws.send_text("sync")
+    assert ws.receive_json()["type"] == "error"
+
+
+def test_malformed_commands_get_error_frames(engine):
+    with TestClient(app).websocket_connect("/events/ws") as ws:
+        ws.send_text("{not json")
+        assert ws.receive_json()["type"] == "error"
+        ws.send_bytes(b"\xff\xfe")
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json([1, 2])
+        assert ws.receive_json()["type"] == "error"
+
+        # Kết nối vẫn dùng được sau các lệnh sai
+        ws.send_json({"subscribe": 7})
+        sync(ws)
+        broker.publish([post_channel(7)], {"type": "comment_created", "post_id": 7})
+        assert ws.receive_json() == {"type": "comment_created", "post_id": 7}
+
+
+def test_subscriptions_are_capped(engine, monkeypatch):
+    monkeypatch.setattr(events, "EVENTS_WS_MAX_SUBSCRIPTIONS", 2)
+    with TestClient(app).websocket_connect("/events/ws") as ws:
+        for post_id in (1, 2, 2):
+            ws.send_json({"subscribe": post_id})
+        ws.send_json({"subscribe": 3})
+        error = ws.receive_json()
+        assert error["type"] == "error"
+
+        ws.send_json({"unsubscribe": 1})
+        ws.send_json({"subscribe": 3})
+        sync(ws)
+        broker.publish([post_channel(3)], {"type": "post_voted", "post_id": 3})
+        assert ws.receive_json() == {"type": "post_voted", "post_id": 3}
+
+
+def test_boolean_post_ids_are_ignored(engine, monkeypatch):
+    monkeypatch.setattr(events, "EVENTS_WS_MAX_SUBSCRIPTIONS", 1)
+    with TestClient(app).websocket_connect("/events/ws") as ws:
+        ws.send_json({"subscribe": True})
+        ws.send_json({"unsubscribe": False})
+        # Chỗ duy nhất còn trống vẫn dành cho một id thật
+        ws.send_json({"subscribe": 1})
+        sync(ws)
+        broker.publish([post_channel(1)], {"type": "post_voted", "post_id": 1})
+        assert ws.receive_json() == {"type": "post_voted", "post_id": 1}
@@ -0,0 +1,153 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, insert
+
+from app.database import SessionLocal
+from app.models.models import Comment, Post, User, Vote
+from app.routers.posts import load_feed
+from app.utils.ranking import refresh_hot_scores
+
+POSTS = 120
+VIEWER_ID = 1
+
+
+@pytest.fixture
+def forum(engine):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "password": "x", "reputation": i * 10, "role": "member"}
+            for i in range(1, 6)
+        ])
+        conn.execute(insert(Post), [
+            {
+                "id": i, "title": f"post {i}", "content": "lorem ipsum " * 50, "author_id": i % 5 + 1,
+                "created_at": now - timedelta(minutes=i), "is_pinned": i in (7, 42),
+                "comment_count": 0, "vote_count": 0,
+            }
+            for i in range(1, POSTS + 1)
+        ])
+        conn.execute(insert(Comment), [
+            {"content": "comment", "author_id": 2, "post_id": i, "created_at": now, "vote_count": 0}
+            for i in range(1, POSTS + 1, 3)
+        ])
+        conn.execute(insert(Vote), [
+            {"user_id": VIEWER_ID, "post_id": i, "vote_type": 1} for i in range(1, POSTS + 1, 2)
+        ])
+        refresh_hot_scores(conn)
+    return engine
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def run_feed(engine, **kwargs):
+    db = SessionLocal()
+    try:
+        # Mở connection trước để các câu lệnh khi kết nối (pre-ping...) không bị đếm
+        db.connection()
+        with count_queries(engine) as statements:
+            result = load_feed(db, **kwargs)
+        return result, len(statements)
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("current_user_id", [None, VIEWER_ID])
+@pytest.mark.parametrize("sort", ["hot", "new", "top"])
+def test_cursor_feed_query_count_does_not_grow_with_limit(forum, sort, current_user_id):
+    for limit in (5, 50):
+        first, first_queries = run_feed(
+            forum, skip=0, limit=limit, search=None, cursor="", sort=sort, current_user_id=current_user_id
+        )
+        # Trang đầu: bài ghim + một trang bài thường
+        assert len(first["items"]) == limit + 2
+        assert first_queries == 2
+
+        second, second_queries = run_feed(
+            forum, skip=0, limit=limit, search=None, cursor=first["next_cursor"], sort=sort,
+            current_user_id=current_user_id
+        )
+        assert len(second["items"]) == limit
+        assert second_queries == 1
+
+
+@pytest.mark.parametrize("current_user_id", [None, VIEWER_ID])
+def test_offset_feed_query_count_does_not_grow_with_limit(forum, current_user_id):
+    for limit in (5, 50):
+        items, queries = run_feed(forum, skip=0, limit=limit, search=None, cursor=None, current_user_id=current_user_id)
+        assert len(items) == limit + 2
+        assert queries == 2
+
+        items, queries = run_feed(forum, skip=limit, limit=limit, search=None, cursor=None, current_user_id=current_user_id)
+        assert len(items) == limit
+        assert queries == 1
+
+
+def test_has_voted_comes_from_the_same_queries(forum):
+    result, _ = run_feed(forum, skip=0, limit=50, search=None, cursor="", current_user_id=VIEWER_ID)
+    for item in result["items"]:
+        assert item["has_voted"] == (item["id"] % 2 == 1)
+        assert item["vote_count"] == 0
+        assert item["author_name"] == "user%d" % item["author_id"]
+
+
+@pytest.mark.parametrize("search", ["!!!", "%"])
+def test_search_without_terms_returns_nothing(forum, search):
+    items, queries = run_feed(forum, skip=0, limit=10, search=search, cursor=None)
+    assert items == []
+    assert queries == 0
+
+    page, _ = run_feed(forum, skip=0, limit=10, search=search, cursor="")
+    assert page == {"items": [], "next_cursor": None}
+
+
+def crafted_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("sort, values", [
+    ("hot", [[1], 1]),
+    ("hot", ["1", 1]),
+    ("hot", [True, 1]),
+    ("new", [1.5, 1]),
+    ("new", [{"d": "2024-01-01"}, 1]),
+    ("top", [1.5, 1]),
+    ("top", [1, "1"]),
+])
+def test_cursor_with_wrong_value_types_is_rejected(forum, sort, values):
+    with pytest.raises(HTTPException) as error:
+        run_feed(forum, skip=0, limit=10, search=None, cursor=crafted_cursor({"k": sort, "v": values}), sort=sort)
+    assert error.value.status_code == 400
+
+
+# Mọi bài đều khớp "lorem" với cùng một rank: các trang cursor phải phủ đủ mọi bài, không lặp.
+# Trên PostgreSQL rank là float4 nếu không ép kiểu, cursor (float8) lệch khỏi giá trị trong cột
+def test_search_cursor_pages_through_equal_ranks(forum):
+    if forum.dialect.name != "postgresql":
+        pytest.skip("chỉ PostgreSQL dùng ts_rank")
+
+    seen = []
+    cursor = ""
+    while cursor is not None:
+        page, _ = run_feed(forum, skip=0, limit=25, search="lorem", cursor=cursor)
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+    assert sorted(seen) == list(range(1, POSTS + 1))
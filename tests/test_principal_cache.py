@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, update
+
+from app.main import app
+from app.models.models import Post, User
+from app.utils.events import broker
+from app.utils.principal_cache import PRINCIPAL_CHANNEL, principal_cache
+from app.utils.security import create_access_token
+
+
+def auth(user_id):
+    return {"Authorization": "Bearer " + create_access_token({"sub": f"user{user_id}", "id": user_id})}
+
+
+@pytest.fixture
+def users(engine):
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "password": "x", "reputation": 0, "role": "member"} for i in (1, 2)
+        ])
+        conn.execute(insert(Post).values(
+            id=1, title="post", content="content", author_id=1, created_at=datetime.utcnow(), comment_count=0, vote_count=0
+        ))
+    return engine
+
+
+def test_me_returns_live_reputation(users):
+    client = TestClient(app)
+    assert client.get("/users/me", headers=auth(1)).json()["reputation"] == 0
+    assert principal_cache.get(1) is not None
+
+    assert client.post("/posts/1/vote", headers=auth(2)).status_code == 200
+    assert client.get("/users/me", headers=auth(1)).json()["reputation"] == 1
+
+
+# Sự kiện từ worker khác tới qua backend của broker (NOTIFY với EVENTS_BACKEND=postgres)
+def test_invalidation_from_another_worker_evicts_principal(users):
+    client = TestClient(app)
+    assert client.get("/users/me", headers=auth(2)).status_code == 200
+    assert principal_cache.get(2) is not None
+
+    with users.begin() as conn:
+        conn.execute(update(User).where(User.id == 2).values(is_banned=True))
+    broker.deliver([PRINCIPAL_CHANNEL], {"type": "principals_invalidated", "user_ids": [2]})
+
+    assert principal_cache.get(2) is None
+    assert client.get("/users/me", headers=auth(2)).status_code == 403
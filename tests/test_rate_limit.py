@@ -0,0 +1,30 @@
+import threading
+
+from app.utils.rate_limit import SQLRateLimitBackend
+
+LIMIT = 5
+WORKERS = 20
+
+
+# Nhiều worker cùng lúc gọi hit() với một khóa: đúng LIMIT lượt được phép, số còn lại phải chờ
+def test_sql_backend_never_over_admits_racing_requests(engine):
+    backend = SQLRateLimitBackend()
+    barrier = threading.Barrier(WORKERS)
+    waits = []
+    lock = threading.Lock()
+
+    def hit():
+        barrier.wait()
+        wait = backend.hit("vote:1", LIMIT, 60)
+        with lock:
+            waits.append(wait)
+
+    threads = [threading.Thread(target=hit) for _ in range(WORKERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(1 for wait in waits if not wait) == LIMIT
+    assert all(0 < wait <= 60 for wait in waits if wait)
+    assert backend.stats()["size"] == LIMIT
@@ -0,0 +1,75 @@
+import threading
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, insert, select
+
+from app.main import app
+from app.models.models import Comment, Post, User, Vote
+from app.utils.security import create_access_token
+
+AUTHOR_ID = 1
+VOTERS = 15
+# Mỗi voter chạy hai thread song song (double-click) cùng lúc với mọi voter khác
+THREADS_PER_VOTER = 2
+ROUNDS = 3
+VOTE_ROUTES = ("/posts/1/vote", "/votes/1", "/comments/1/vote")
+
+
+@pytest.fixture
+def thread(engine):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "password": "x", "reputation": 0, "role": "member"}
+            for i in range(1, VOTERS + 2)
+        ])
+        conn.execute(insert(Post).values(
+            id=1, title="post", content="content", author_id=AUTHOR_ID, created_at=now, comment_count=1, vote_count=0
+        ))
+        conn.execute(insert(Comment).values(
+            id=1, content="comment", author_id=AUTHOR_ID, post_id=1, created_at=now, vote_count=0
+        ))
+    return engine
+
+
+# SQLite tuần tự hóa mọi giao dịch ghi nên chỉ kiểm tra được xung đột unique index và lỗi khóa;
+# chạy với TEST_DATABASE_URL trỏ tới PostgreSQL để kiểm tra cả lost update giữa các giao dịch song song
+def test_concurrent_vote_toggles_keep_counters_consistent(thread):
+    client = TestClient(app, raise_server_exceptions=False)
+    voter_ids = range(AUTHOR_ID + 1, VOTERS + 2)
+    workers = [voter_id for voter_id in voter_ids for _ in range(THREADS_PER_VOTER)]
+    barrier = threading.Barrier(len(workers))
+    statuses = []
+    lock = threading.Lock()
+
+    def hammer(voter_id):
+        headers = {"Authorization": "Bearer " + create_access_token({"sub": f"user{voter_id}", "id": voter_id})}
+        barrier.wait()
+        for _ in range(ROUNDS):
+            for route in VOTE_ROUTES:
+                status = client.post(route, headers=headers).status_code
+                with lock:
+                    statuses.append(status)
+
+    threads = [threading.Thread(target=hammer, args=(voter_id,)) for voter_id in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(statuses) == len(workers) * ROUNDS * len(VOTE_ROUTES)
+    assert set(statuses) <= {200, 201}
+
+    with thread.connect() as conn:
+        post_votes = conn.execute(select(func.count(Vote.id)).where(Vote.post_id == 1)).scalar()
+        comment_votes = conn.execute(select(func.count(Vote.id)).where(Vote.comment_id == 1)).scalar()
+        # Mỗi user chỉ còn tối đa một vote cho mỗi bài / bình luận
+        assert conn.execute(select(func.count(func.distinct(Vote.user_id))).where(Vote.post_id == 1)).scalar() == post_votes
+        assert conn.execute(select(func.count(func.distinct(Vote.user_id))).where(Vote.comment_id == 1)).scalar() == comment_votes
+
+        assert conn.execute(select(Post.vote_count).where(Post.id == 1)).scalar() == post_votes
+        assert conn.execute(select(Comment.vote_count).where(Comment.id == 1)).scalar() == comment_votes
+        # Không tự vote nên uy tín tác giả bằng tổng số vote còn lại trên bài và bình luận của họ
+        assert conn.execute(select(User.reputation).where(User.id == AUTHOR_ID)).scalar() == post_votes + comment_votes